@@ -1,25 +1,58 @@
+import argparse
 import os
 import re
+import hashlib
 import json
 import time
 import sys
 import requests
 import subprocess
+import threading
+from contextlib import ExitStack, contextmanager
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
-
-BASE = "https://oshoworld.com"
+from concurrent.futures import (
+    FIRST_EXCEPTION,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
+
+from oshodl import catalog, compact, jsonstream, metrics, profiling, verify, writer
+from oshodl.adaptive import AdaptiveLimiter, Cancelled
+from oshodl.http_pool import configure as configure_http, get_pool
+from oshodl.links import LINK_MODES, link_file
+from oshodl.planner import PLAN_WORKERS, Plan, PlanItem, disk_free, fetch_sizes
+from oshodl.progress import ProgressBoard, estimate_size, human_rate, human_size, human_time
+from oshodl.ratelimit import BandwidthLimiter, Schedule
+from oshodl.retry import RETRIES, Incomplete, describe, is_transient, status_of, with_retries
+from oshodl.state import STATE_NAME, DownloadState
+
+# OSHOWORLD_BASE points the tools at another server (e.g. tools/fake_server.py)
+BASE = os.environ.get("OSHOWORLD_BASE", "https://oshoworld.com").rstrip("/")
 BASE_OUT_DIR = Path("downloads")
-CHUNK_SIZE = 1024 * 1024  # 1 MB
-MAX_WORKERS = 4
+# Parallel downloads start at WORKERS and are tuned between MIN_WORKERS and
+# MAX_WORKERS from measured throughput and errors (equal bounds = fixed).
+WORKERS = 4
+MIN_WORKERS = 1
+MAX_WORKERS = 16
+
+# Segmented mode (--segments): split one large episode into byte ranges
+# fetched in parallel. 1 disables it; only files of at least
+# SEGMENT_MIN_SIZE are split.
+SEGMENTS = 1
+MAX_SEGMENTS = 16
+SEGMENT_MIN_SIZE = 32 * 1024 * 1024  # 32 MB
 
 STRUCTURE_FILES = {
     "hindi": {
         "path": "structure_hindi.json",
+        "compact": "structure_hindi.bin",
         "builder": ["python", "./tools/structure_cache_hindi.py"],
     },
     "english": {
         "path": "structure_english.json",
+        "compact": "structure_english.bin",
         "builder": ["python", "./tools/structure_cache_english.py"],
     },
 }
@@ -27,16 +60,38 @@ STRUCTURE_FILES = {
 # -------------------- Utilities --------------------
 
 
-def ensure_cache(language):
+def start_cache_build(language):
+    """
+    Start building a missing cache in the background, with the builder's
+    output going to a log file. Returns the process, or None if the cache
+    already exists.
+    """
     info = STRUCTURE_FILES[language]
-    path = Path(info["path"])
+    if Path(info["path"]).exists():
+        return None
 
-    if path.exists():
-        return
+    log_path = Path(info["path"]).with_suffix(".build.log")
+    print(f"[!] Cache missing for {language}, building it in the background (log: {log_path})")
+    with open(log_path, "w", encoding="utf-8") as log:
+        return subprocess.Popen(info["builder"], stdout=log, stderr=subprocess.STDOUT)
+
+
+def ensure_cache(language, proc=None):
+    """
+    Make sure the cache for language exists, waiting for a background build
+    started by start_cache_build, or building it in the foreground.
+    """
+    info = STRUCTURE_FILES[language]
+    path = Path(info["path"])
 
-    print(f"[!] Cache missing for {language}, building it now...")
-    print("One time process, it will take a few minutes")
-    result = subprocess.run(info["builder"])
+    if proc is not None:
+        if proc.poll() is None:
+            print(f"[*] Waiting for the {language} cache build to finish...")
+        proc.wait()
+    elif not path.exists():
+        print(f"[!] Cache missing for {language}, building it now...")
+        print("One time process, it will take a few minutes")
+        subprocess.run(info["builder"])
 
     if not path.exists():
         print(f"[!] Failed to build cache for {language}")
@@ -49,166 +104,1557 @@ def sanitize(name: str) -> str:
     return re.sub(r"[^\w\-. ()]", "_", name).strip()
 
 
-def human_time(seconds: float) -> str:
-    if seconds <= 0:
-        return "∞"
-    m, s = divmod(int(seconds), 60)
-    h, m = divmod(m, 60)
-    if h:
-        return f"{h}h {m}m"
-    if m:
-        return f"{m}m {s}s"
-    return f"{s}s"
+# -------------------- Load Cached Structure --------------------
 
 
-# -------------------- Progress Tracker --------------------
+def iter_structure(lang):
+    """
+    Yield lang's series one at a time straight from the JSON cache, so only
+    one of them is in memory at once.
+    """
+    path = STRUCTURE_FILES[lang]["path"]
+    with open(path, "r", encoding="utf-8") as f:
+        # Hindi format → list, English format → { language, series }
+        yield from profiling.timed_iter(jsonstream.iter_array(f, key="series"), "json")
 
 
-class SeriesProgress:
-    def __init__(self, total_eps: int):
-        self.total = total_eps
-        self.done = 0
-        self.start = time.time()
-        self.times = []
+def load_structure(lang):
+    return list(iter_structure(lang))
+
+
+@contextmanager
+def series_index(lang):
+    """
+    Context manager giving (titles, entry) for lang: every series title in
+    cache order, and entry(i) giving series i in full. Read from the
+    compact catalog, which decodes a series only when it is asked for; a
+    missing or stale one is rewritten from the JSON cache first. entry only
+    works inside the with block, which unmaps the catalog when it ends.
+    """
+    info = STRUCTURE_FILES[lang]
+    packed = compact.open_compact(info["compact"], info["path"])
+    if packed is None:
+        try:
+            compact.write_compact(info["compact"], iter_structure(lang), info["path"])
+            packed = compact.open_compact(info["compact"], info["path"])
+        except OSError as e:
+            print(f"[!] Couldn't write {info['compact']}: {e}")
+    if packed is not None:
+        with packed:
+            yield packed.titles(), packed.entry
+        return
 
-    def mark_episode_done(self, seconds):
-        self.done += 1
-        self.times.append(seconds)
+    series = load_structure(lang)
+    yield [s["title"] for s in series], series.__getitem__
+
+
+# -------------------- Global Search --------------------
+
+
+def global_search(rx):
+    """
+    Search both languages. Returns [(label, load)] where load() gives the
+    (lang, entry) to download.
+
+    Series titles are matched with the regex. With SQLite FTS5 available,
+    sub-series and episode titles and descriptions are searched too, and
+    such hits download just that sub-series or episode.
+    """
+    langs = [lang for lang in LANGS if Path(STRUCTURE_FILES[lang]["path"]).exists()]
+
+    if not catalog.fts5_available():
+        matches = []
+        for lang in langs:
+            with series_index(lang) as (titles, entry):
+                for i, title in enumerate(titles):
+                    if rx.search(title):
+                        # decoded now: the catalog is closed by the time
+                        # the user picks
+                        matches.append(
+                            (f"({lang.upper()}) {title}", lambda l=lang, s=entry(i): (l, s))
+                        )
+        return matches
+
+    files = {lang: STRUCTURE_FILES[lang]["path"] for lang in langs}
+    conn = catalog.open_catalog(catalog.CATALOG_FILE, files, iter_structure)
+
+    hits = catalog.search_series(conn, rx.pattern)
+    text_hits = catalog.search_text(conn, rx.pattern)
+    if len(text_hits) == catalog.EPISODE_HIT_LIMIT:
+        print(f"[i] Showing the best {catalog.EPISODE_HIT_LIMIT} episode matches")
+
+    matches = []
+    for hit in hits + text_hits:
+        if hit.kind == "series":
+            label = f"({hit.lang.upper()}) {hit.title}"
+        else:
+            label = f"({hit.lang.upper()}) {hit.title}  — {hit.kind} in {hit.context}"
+        matches.append((label, lambda hit=hit: catalog.load_target(conn, hit)))
+    return matches
 
-    def eta(self) -> str:
-        if not self.times:
-            return "∞"
-        avg = sum(self.times) / len(self.times)
-        remaining = self.total - self.done
-        return human_time(avg * remaining)
 
+# -------------------- Episode Download --------------------
 
-# -------------------- Load Cached Structure --------------------
 
+def content_range_total(value):
+    """
+    Total size from a Content-Range header ("bytes 100-199/1000" or
+    "bytes */1000"), or None when the server didn't send one.
+    """
+    m = re.match(r"bytes\s+(?:\d+-\d+|\*)/(\d+)", value or "")
+    return int(m.group(1)) if m else None
 
-def load_structure(lang):
-    path = STRUCTURE_FILES[lang]["path"]
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
 
-    # Hindi format → list
-    if isinstance(data, list):
-        return data
+def open_stream(url, offset):
+    """
+    Start a GET for url continuing at byte offset.
 
-    # English format → { language, series }
-    if isinstance(data, dict) and "series" in data:
-        return data["series"]
+    Returns (response, offset, expected_total). The offset is reset to 0 if
+    the server ignores the Range header and sends the whole file, or sends
+    a different range (the file is then requested again in full). A 416
+    response is returned as-is so the caller can check whether the partial
+    file is already complete.
+    """
+    headers = {}
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
 
-    raise ValueError("Unknown structure format")
+    r = get_pool().get(url, headers=headers, stream=True, timeout=60)
 
+    if offset and r.status_code == 416:
+        return r, offset, content_range_total(r.headers.get("Content-Range"))
 
-# -------------------- Episode Download --------------------
+    if not r.ok:
+        # hand the connection back before the error propagates
+        r.close()
+        r.raise_for_status()
+    length = int(r.headers.get("Content-Length", 0)) or None
+
+    if offset and r.status_code == 206:
+        m = re.match(r"bytes\s+(\d+)-", r.headers.get("Content-Range", ""))
+        if m and int(m.group(1)) == offset:
+            total = content_range_total(r.headers.get("Content-Range"))
+            if total is None and length is not None:
+                total = offset + length
+            return r, offset, total
+
+    if r.status_code == 206:
+        # A range other than the one asked for: its body isn't what goes
+        # at offset, nor the whole file
+        r.close()
+        if offset:
+            return open_stream(url, 0)
+        raise requests.exceptions.HTTPError(
+            f"206 Partial Content without a Range request for {url}", response=r
+        )
+
+    # Plain 200: the server ignored the Range header, start over
+    return r, 0, length
+
+
+def probe_ranges(url):
+    """
+    HEAD the file and return (size, accepts_ranges).
+    """
+    r = get_pool().head(url, allow_redirects=True)
+    r.raise_for_status()
+    size = int(r.headers.get("Content-Length", 0)) or None
+    return size, r.headers.get("Accept-Ranges", "").lower() == "bytes"
+
+
+class SegmentState:
+    """
+    Per-segment progress of a segmented download, persisted next to the
+    .part file so an interrupted download resumes every range where it
+    stopped. Saved state never claims more bytes than were written.
+    """
+
+    def __init__(self, path, size, segments):
+        self.path = path
+        self.size = size
+        self.segments = segments  # [start, end (inclusive), done]
+        self._lock = threading.Lock()
+        self._last_save = 0.0
+
+    @classmethod
+    def create(cls, path, size, count):
+        step = -(-size // count)
+        segments = [
+            [start, min(start + step, size) - 1, 0] for start in range(0, size, step)
+        ]
+        return cls(path, size, segments)
+
+    @classmethod
+    def load(cls, path, size):
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if data.get("size") != size:
+            return None
+        return cls(path, size, data["segments"])
+
+    def written(self):
+        with self._lock:
+            return sum(done for _, _, done in self.segments)
+
+    def advance(self, i, n):
+        with self._lock:
+            self.segments[i][2] += n
+            if time.time() - self._last_save >= 1:
+                self._save()
+
+    def save(self):
+        with self._lock:
+            self._save()
+
+    def _save(self):
+        data = {"size": self.size, "segments": self.segments}
+        self.path.write_text(json.dumps(data), encoding="utf-8")
+        self._last_save = time.time()
+
+
+def fetch_segment(url, part_path, state, i, monitor=None):
+    start, end, done = state.segments[i]
+    pos = start + done
+    if pos > end:
+        return
 
+    headers = {"Range": f"bytes={pos}-{end}"}
+    with get_pool().get(url, headers=headers, stream=True, timeout=60) as r:
+        r.raise_for_status()
+        if r.status_code != 206:
+            raise requests.exceptions.HTTPError(
+                f"Server ignored Range for segment {pos}-{end}", response=r
+            )
 
-def download_episode(ep, folder, idx, total_eps, progress):
-    url = BASE + ep["file"]
-    name = sanitize(Path(url).name)
-    out_path = Path(folder) / name
-    out_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(part_path, "r+b") as f:
+            f.seek(pos)
+            cap = (lambda: monitor.chunk_size) if monitor else None
+            for chunk in writer.chunks(r, limit=end - pos + 1, cap=cap):
+                with profiling.stage("disk"):
+                    f.write(chunk)
+                state.advance(i, len(chunk))
+                if monitor:
+                    monitor.on_bytes(len(chunk))
+
+
+def download_segmented(url, part_path, size, task=None, monitor=None):
+    """
+    Fetch url into a preallocated part_path using SEGMENTS parallel range
+    requests. Returns True once every byte is in place.
+    """
+    state_path = part_path.with_name(part_path.name + ".segments")
+    state = None
+    if part_path.exists():
+        state = SegmentState.load(state_path, size)
+    if state is None:
+        state = SegmentState.create(state_path, size, SEGMENTS)
+        with open(part_path, "wb") as f:
+            if not writer.preallocate(f, 0, size):
+                f.truncate(size)
+        state.save()
+    if task:
+        task.resume(state.written())
+
+    with ThreadPoolExecutor(max_workers=len(state.segments)) as executor:
+        futures = [
+            executor.submit(fetch_segment, url, part_path, state, i, monitor)
+            for i in range(len(state.segments))
+        ]
+        try:
+            pending = futures
+            while pending:
+                done, pending = wait(pending, timeout=1, return_when=FIRST_EXCEPTION)
+                for f in done:
+                    f.result()
+                if task:
+                    task.set_bytes(state.written())
+        finally:
+            state.save()
 
-    if out_path.exists() and out_path.stat().st_size > 0:
-        print(f"    [{idx}/{total_eps}] Exists: {name}")
-        progress.mark_episode_done(0)  # already done, no time added
-        return
+    if state.written() != size:
+        return False
 
-    headers = {"User-Agent": "Mozilla/5.0"}
-    print(f"    [{idx}/{total_eps}] Downloading {name}")
+    writer.sync_path(part_path)
+    state_path.unlink(missing_ok=True)
+    return True
 
-    episode_start = time.time()  # 🔹 START TIMING HERE
-    last_print = episode_start
 
-    with requests.get(url, headers=headers, stream=True, timeout=60) as r:
-        r.raise_for_status()
-        file_size = int(r.headers.get("Content-Length", 0))
-        written = 0
+def episode_path(ep, folder):
+    return Path(folder) / sanitize(Path(BASE + ep["file"]).name)
 
-        with open(out_path, "wb") as f:
-            for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
-                if not chunk:
-                    continue
 
-                f.write(chunk)
-                written += len(chunk)
-                now = time.time()
-                if now - last_print >= 1:
-                    print(
-                        f"\r    [{idx}/{total_eps}] {name[:40]:40} ETA {progress.eta()}",
-                        end="",
-                        flush=True,
-                    )
-                    last_print = now
+def download_episode(ep, folder, idx, total_eps, task=None, monitor=None):
+    """
+    Download one episode into folder, resuming any .part left behind.
+    task, if given, is the episode's EpisodeProgress and is kept up to date
+    with its size and byte count. monitor, if given, is told about every
+    chunk via on_bytes(n) (which may block to enforce a bandwidth cap),
+    caps the read size (chunk_size, None for no cap) and takes log lines
+    (log).
 
-        elapsed = time.time() - episode_start
+    When the size is known the .part is preallocated and, like a segmented
+    download, tracked in a .segments file, since its size no longer shows
+    how much has arrived.
 
-        if file_size and written != file_size:
-            print(f"    [!] Size mismatch for {name}")
-        else:
-            progress.mark_episode_done(elapsed)
-            print(f"    [✓] Done: {name}")
+    Returns (status, bytes, expected size, sha256) with status "done",
+    "partial" or "exists" (the file was already there and wasn't touched);
+    expected size and checksum are None when not known.
+    """
+    log = monitor.log if monitor else print
+    url = BASE + ep["file"]
+    out_path = episode_path(ep, folder)
+    name = out_path.name
+    part_path = out_path.with_name(name + ".part")
+    out_path.parent.mkdir(parents=True, exist_ok=True)
 
+    size = out_path.stat().st_size if out_path.exists() else 0
+    if size > 0:
+        log(f"    [{idx}/{total_eps}] Exists: {name}")
+        if task:
+            task.set_size(size)
+            task.resume(size)
+        return "exists", size, None, None
+
+    # A .segments file means the .part is a preallocated segmented
+    # download, whose size says nothing about how much has been fetched.
+    segmented = part_path.with_name(part_path.name + ".segments").exists()
+    if SEGMENTS > 1 or segmented:
+        size, ranged = probe_ranges(url)
+        if ranged and size and (segmented or size >= SEGMENT_MIN_SIZE):
+            if segmented:
+                log(f"    [{idx}/{total_eps}] Resuming {name} (segmented)")
+            else:
+                log(f"    [{idx}/{total_eps}] Downloading {name} in {SEGMENTS} segments")
+            if task:
+                task.set_size(size)
+            if download_segmented(url, part_path, size, task, monitor):
+                os.replace(part_path, out_path)
+                log(f"    [✓] Done: {name}")
+                return "done", size, size, None
+            log(f"    [!] Incomplete: {name}, will resume on next run")
+            return "partial", None, size, None
+        if segmented:
+            # Server stopped advertising ranges; the sparse .part is useless
+            part_path.with_name(part_path.name + ".segments").unlink()
+            part_path.unlink(missing_ok=True)
+
+    offset = part_path.stat().st_size if part_path.exists() else 0
+    if offset:
+        log(f"    [{idx}/{total_eps}] Resuming {name} at {human_size(offset)}")
+    else:
+        log(f"    [{idx}/{total_eps}] Downloading {name}")
+
+    r, offset, file_size = open_stream(url, offset)
+    if r.status_code == 416:
+        r.close()
+        # Nothing left past our offset: either the .part is already
+        # complete or it is longer than the real file and unusable.
+        if file_size == offset:
+            os.replace(part_path, out_path)
+            if task:
+                task.set_size(file_size)
+                task.resume(offset)
+            log(f"    [✓] Done: {name}")
+            return "done", offset, file_size, None
+        part_path.unlink(missing_ok=True)
+        r, offset, file_size = open_stream(url, 0)
+
+    if task:
+        task.set_size(file_size)
+        task.resume(offset)
+
+    state_path = part_path.with_name(part_path.name + ".segments")
+    with r:
+        written = offset
+        # only a download that starts at byte 0 can be hashed on the fly
+        digest = hashlib.sha256() if offset == 0 else None
+        state = None
+
+        with open(part_path, "r+b" if offset else "wb") as f:
+            if file_size and file_size > offset:
+                # saved before the file grows, so a crash can't leave a
+                # full-size .part that looks finished
+                state = SegmentState(state_path, file_size, [[0, file_size - 1, offset]])
+                state.save()
+                if not writer.preallocate(f, offset, file_size):
+                    state_path.unlink()
+                    state = None
+            f.seek(offset)
+
+            cap = (lambda: monitor.chunk_size) if monitor else None
+            try:
+                for chunk in writer.chunks(r, cap=cap):
+                    with profiling.stage("disk"):
+                        f.write(chunk)
+                    if digest:
+                        with profiling.stage("hash"):
+                            digest.update(chunk)
+                    written += len(chunk)
+                    if state:
+                        state.advance(0, len(chunk))
+                    if task:
+                        task.advance(len(chunk))
+                    if monitor:
+                        monitor.on_bytes(len(chunk))
+            finally:
+                if state:
+                    state.save()
+
+            if written == file_size or not file_size:
+                writer.sync(f)
 
-# -------------------- Entry Download --------------------
+        if file_size and written != file_size:
+            if written > file_size:
+                part_path.unlink(missing_ok=True)
+                state_path.unlink(missing_ok=True)
+                written = 0
+            log(
+                f"    [!] Size mismatch for {name} "
+                f"({human_size(written)} of {human_size(file_size)}), "
+                "will resume on next run"
+            )
+            return "partial", written, file_size, None
 
+        state_path.unlink(missing_ok=True)
+        os.replace(part_path, out_path)
+        log(f"    [✓] Done: {name}")
+        return "done", written, file_size, digest.hexdigest() if digest else None
 
-def download_entry(entry, out_dir):
-    print(f"\n=== Downloading Series: {entry['title']} ===")
 
+def episode_need(ep, folder, size):
+    """
+    (bytes still to fetch, extra disk space needed) for an episode of the
+    given size, after what is already on disk.
+    """
+    out_path = episode_path(ep, folder)
+    if out_path.exists() and out_path.stat().st_size > 0:
+        return 0, 0
+    if not size:
+        return 0, 0
+    part_path = out_path.with_name(out_path.name + ".part")
+    segments = SegmentState.load(part_path.with_name(part_path.name + ".segments"), size)
+    if segments is not None:
+        # preallocated: the space is already taken
+        return max(size - segments.written(), 0), 0
+    have = part_path.stat().st_size if part_path.exists() else 0
+    left = max(size - have, 0)
+    return left, left
+
+
+# -------------------- Download Scheduler --------------------
+
+DOWNLOADED = metrics.counter("oshodl_download_bytes_total", "Episode bytes downloaded")
+EPISODES = metrics.counter(
+    "oshodl_episodes_total", "Episodes by result (done, failed, skipped, linked)", ["result"]
+)
+MIN_RATE_SAMPLE = 8 * 1024 * 1024  # bytes a run must move for its throughput to be kept
+DEDUPLICATED = metrics.counter(
+    "oshodl_deduplicated_bytes_total", "Bytes linked from another folder instead of downloaded"
+)
+
+
+class SeriesGroup:
+    """
+    One output folder worth of episodes: a plain series or one sub-series
+    of a container. Its progress (SeriesTotals) lives on the scheduler's
+    ProgressBoard.
+    """
+
+    def __init__(self, title, folder, episodes):
+        self.title = title
+        self.folder = folder
+        self.episodes = episodes
+        self.progress = None
+        self._pending = len(episodes)
+        self._started = False
+        self._lock = threading.Lock()
+
+    def episode_started(self):
+        with self._lock:
+            first = not self._started
+            self._started = True
+        return first
+
+    def episode_finished(self):
+        with self._lock:
+            self._pending -= 1
+            return self._pending == 0
+
+
+def plan_entry(entry, out_dir):
+    """
+    (title, folder, episodes) for each output folder of a cache entry.
+    """
     # Case 1: container with subseries (Hindi only)
     if "subseries" in entry:
-        total_sub = len(entry["subseries"])
-
-        for si, ss in enumerate(entry["subseries"], 1):
-            episodes = ss["episodes"]
-            total_eps = len(episodes)
+        return [
+            (
+                f"{entry['title']} / {ss['title']}",
+                out_dir / entry["slug"] / ss["slug"],
+                ss["episodes"],
+            )
+            for ss in entry["subseries"]
+        ]
 
+    # Case 2: normal series (ALL English + most Hindi)
+    return [(entry["title"], out_dir / entry["slug"], entry["episodes"])]
+
+
+class DownloadScheduler:
+    """
+    One long-lived worker pool shared by every selected target.
+
+    Episodes from all series are queued up front in selection order, so a
+    worker that finishes early moves straight on to the next series instead
+    of waiting for the slowest episode of the current one. How many of them
+    download at once is tuned by an AdaptiveLimiter; their combined
+    bandwidth is capped by an optional BandwidthLimiter.
+
+    Transient failures are retried with backoff (the .part resumes where it
+    stopped) without holding a download slot. Episodes that still fail are
+    recorded as failed in the state store, and the batch carries on.
+
+    An episode file listed under several of the selected series is
+    downloaded once; the other folders get a link to it (link_mode, see
+    oshodl.links) when it is done. So do folders whose file the state store
+    already has finished somewhere else.
+
+    All output while running goes through one ProgressBoard.
+    """
+
+    def __init__(
+        self,
+        workers=WORKERS,
+        min_workers=MIN_WORKERS,
+        max_workers=MAX_WORKERS,
+        state=None,
+        bandwidth=None,
+        retries=RETRIES,
+        link_mode="hardlink",
+    ):
+        self.board = ProgressBoard()
+        self.log = self.board.log
+        self.limiter = AdaptiveLimiter(workers, min_workers, max_workers, log=self.log)
+        metrics.gauge(
+            "oshodl_active_workers", "Episodes downloading right now", fn=lambda: self.limiter.active
+        )
+        metrics.gauge(
+            "oshodl_worker_limit", "Current adaptive download limit", fn=lambda: self.limiter.limit
+        )
+        self.bandwidth = bandwidth
+        if bandwidth:
+            bandwidth.log = self.log
+        self.retries = retries
+        self.failed = []
+        self._failed_lock = threading.Lock()
+        self.state = state
+        self.jobs = []
+        self.groups = []
+        self.queued = set()
+        self.skipped = 0
+        # file -> path of everything the state store says is finished
+        self.done = state.done_paths() if state else {}
+
+        self.link_mode = link_mode
+        self.primary = {}  # file -> path it is downloaded to
+        self.copies = {}  # file -> other paths to link once it is done
+        self.relinks = []  # (finished path, path) to link before starting
+        self.copy_estimate = 0  # guessed bytes of the copies
+        self.linked = {}  # mode actually used -> count
+        self.saved = 0  # bytes not downloaded thanks to links
+        self._link_lock = threading.Lock()
+
+    def add_entry(self, entry, out_dir):
+        for title, folder, episodes in plan_entry(entry, out_dir):
+            pending = []
+            for ep in episodes:
+                path = episode_path(ep, folder)
+                file = ep["file"]
+                done = self.done.get(file)
+                if done == str(path):
+                    self.skipped += 1
+                    EPISODES.inc(result="skipped")
+                # the same episode can be selected twice (a series and one
+                # of its episodes from search); queue each path only once
+                elif path in self.queued:
+                    continue
+                elif file in self.primary:
+                    self.queued.add(path)
+                    self.copies.setdefault(file, []).append(path)
+                    self.copy_estimate += estimate_size(ep) or 0
+                elif done and os.path.exists(done):
+                    # finished in another folder (the store keeps one path
+                    # per file): link it here unless an earlier run did
+                    self.queued.add(path)
+                    if path.exists():
+                        self.skipped += 1
+                        EPISODES.inc(result="skipped")
+                    else:
+                        self.relinks.append((Path(done), path))
+                else:
+                    self.queued.add(path)
+                    self.primary[file] = path
+                    pending.append(ep)
+            if pending:
+                self.add_group(SeriesGroup(title, folder, pending))
+
+    def add_group(self, group):
+        self.groups.append(group)
+        total_eps = len(group.episodes)
+        for i, ep in enumerate(group.episodes, 1):
+            self.jobs.append((group, ep, i, total_eps))
+
+    def plan(self, remember=True):
+        """
+        Size every queued episode and check the disk (see oshodl.planner).
+        Sizes asked of the server are kept in the state store unless
+        remember is false.
+        """
+        known = self.state.known_sizes() if self.state else {}
+        missing = {ep["file"]: BASE + ep["file"] for _, ep, _, _ in self.jobs if ep["file"] not in known}
+        found = {}
+        if missing:
+            print(f"[*] Checking the size of {len(missing)} episodes …")
+            found = fetch_sizes(missing, min(PLAN_WORKERS, self.limiter.maximum))
+            if self.state and found and remember:
+                self.state.remember_sizes(found)
+
+        items = []
+        for job in self.jobs:
+            group, ep = job[0], job[1]
+            file = ep["file"]
+            if file in known:
+                size, source = known[file], "known"
+            elif file in found:
+                size, source = found[file], "head"
+            else:
+                size = estimate_size(ep)
+                source = "estimate" if size else "unknown"
+            fetch, disk = episode_need(ep, group.folder, size)
+            if self.link_mode == "copy" and size:
+                disk += size * len(self.copies.get(file, ()))
+            items.append(PlanItem(job, size, source, fetch, disk))
+
+        rate = self.state.get_meta("throughput") if self.state else None
+        return Plan(items, disk_free(self.groups[0].folder), rate)
+
+    def trim(self, jobs):
+        """
+        Keep only jobs (a subset of the queue), renumbering each series.
+        """
+        by_group = {}
+        for group, ep, _, _ in jobs:
+            by_group.setdefault(group, []).append(ep)
+        kept = {ep["file"] for _, ep, _, _ in jobs}
+        self.copies = {f: paths for f, paths in self.copies.items() if f in kept}
+        self.jobs, self.groups = [], []
+        for group, episodes in by_group.items():
+            self.add_group(SeriesGroup(group.title, group.folder, episodes))
+
+    def _run_episode(self, group, ep, idx, total_eps):
+        # stopped (Ctrl-C or a fatal error) while this one was queued
+        if self.limiter.cancelled:
+            return
+        path = episode_path(ep, group.folder)
+        task = None
+
+        def attempt():
+            nonlocal task
+            with self.limiter:
+                # only now that it has a slot, so queued episodes don't
+                # show up as downloading
+                if task is None:
+                    if group.episode_started():
+                        self.log(
+                            f"\n=== Downloading Series: {group.title} ({total_eps} episodes) ==="
+                        )
+                    if self.state:
+                        self.state.started(ep["file"], path)
+                    task = self.board.start_episode(group.progress, path.name, ep)
+                result = download_episode(
+                    ep, group.folder, idx, total_eps, task, monitor=self
+                )
+            if result[0] == "partial":
+                raise Incomplete("download incomplete", size=result[1])
+            return result
+
+        try:
+            status, size, expected, sha256 = with_retries(
+                attempt, self.retries, what=path.name, on_error=self.on_failure, log=self.log
+            )
+        except Cancelled:
+            # stopped while queued or downloading: left for the next run
+            if task is not None:
+                self.board.finish_episode(task, ok=False)
+                self.log(f"    [!] Stopped: {path.name}, will resume on next run")
+            return
+        except Exception as e:
+            if task is not None:
+                self.board.finish_episode(task, ok=False)
+            EPISODES.inc(result="failed")
+            self.log(f"    [!] Failed: {path.name} ({describe(e)})")
+            if self.state:
+                self.state.failed(
+                    ep["file"], path, getattr(e, "size", None), error=describe(e)
+                )
+            with self._failed_lock:
+                self.failed.append((path, describe(e)))
+        else:
+            self.board.finish_episode(task)
+            if status == "exists":
+                # not downloaded by us, so nothing vouches for it: verify
+                # adopts it after checking it against the server
+                EPISODES.inc(result="skipped")
+            else:
+                EPISODES.inc(result="done")
+                sha256 = self._record(path, ep["file"], size, sha256)
+                if self.state:
+                    self.state.finished(ep["file"], path, size, expected, sha256)
+            for copy in self.copies.pop(ep["file"], ()):
+                self._link(path, copy)
+
+        if group.episode_finished():
+            self.log(f"=== Finished: {group.title} ===\n")
+
+    def _record(self, path, file, size, sha256):
+        """
+        Add a finished episode to its folder's manifest, hashing it first
+        if that didn't happen while downloading. Returns the checksum.
+        """
+        try:
+            if sha256 is None:
+                # resumed and segmented downloads aren't hashed on the fly
+                with profiling.stage("hash"):
+                    sha256 = verify.file_sha256(path)
+            verify.record(path, file, size, sha256)
+        except OSError as e:
+            self.log(f"    [!] Couldn't update the manifest in {path.parent}: {e}")
+        return sha256
+
+    def _link(self, source, path):
+        try:
+            mode = link_file(source, path, self.link_mode)
+        except OSError as e:
+            self.log(f"    [!] Couldn't link {path}: {e}")
+            return
+        if mode is None:
+            return
+        try:
+            verify.copy_record(source, path)
+        except OSError as e:
+            self.log(f"    [!] Couldn't update the manifest in {path.parent}: {e}")
+        size = path.stat().st_size
+        with self._link_lock:
+            self.linked[mode] = self.linked.get(mode, 0) + 1
+            self.saved += size
+        EPISODES.inc(result="linked")
+        DEDUPLICATED.inc(size)
+        self.log(f"    [+] Linked ({mode}): {path.name} → {path.parent}")
+
+    @property
+    def chunk_size(self):
+        return self.bandwidth.chunk_size if self.bandwidth else None
+
+    def on_bytes(self, n):
+        # stopped: end the download here, its .part resumes on the next run
+        if self.limiter.cancelled:
+            raise Cancelled("download cancelled")
+        self.limiter.record_bytes(n)
+        DOWNLOADED.inc(n)
+        if self.bandwidth:
+            self.bandwidth.consume(n)
+
+    def on_failure(self, exc):
+        if isinstance(exc, (Incomplete, Cancelled)):
+            return
+        status = status_of(exc)
+        if status is not None and (status == 429 or status >= 500):
+            self.limiter.record_throttled()
+        elif is_transient(exc):
+            # connection drops and timeouts; a 404, a size mismatch or a
+            # local disk error says nothing about how busy the server is
+            self.limiter.record_error()
+
+    def print_plan(self):
+        for group in self.groups:
+            print(f"  {group.title}: {len(group.episodes)} episodes → {group.folder}")
+        print(f"[*] Dry run: {len(self.jobs)} episodes from {len(self.groups)} series would be downloaded")
+        self._print_links()
+        if self.skipped:
+            print(f"[*] Skipped {self.skipped} episodes already downloaded")
+
+    def _print_links(self):
+        copies = sum(len(paths) for paths in self.copies.values())
+        if copies:
+            print(
+                f"[*] {copies} episodes are also in another selected series: downloading "
+                f"once and linking ({self.link_mode}), ~{human_size(self.copy_estimate)} saved"
+            )
+        if self.relinks:
+            print(f"[*] {len(self.relinks)} episodes are already downloaded to another folder, linking")
+
+    def run(self):
+        print(f"[*] Queued {len(self.jobs)} episodes from {len(self.groups)} series")
+        self._print_links()
+        if self.skipped:
+            print(f"[*] Skipped {self.skipped} episodes already downloaded")
+        for source, path in self.relinks:
+            self._link(source, path)
+        for group in self.groups:
+            group.progress = self.board.add_series(group.title, group.episodes)
+        # enough threads for the largest limit; the limiter gates how many
+        # of them actually download
+        executor = ThreadPoolExecutor(max_workers=self.limiter.maximum)
+        started = time.monotonic()
+        self.limiter.start()
+        self.board.start()
+        try:
+            futures = [executor.submit(self._run_episode, *job) for job in self.jobs]
+            for f in as_completed(futures):
+                f.result()
+        finally:
+            # On error or Ctrl-C drop everything still waiting in the queue;
+            # running downloads stop at their next chunk (see on_bytes)
+            self.limiter.stop()
+            executor.shutdown(wait=True, cancel_futures=True)
+            self.board.stop()
+
+        # remembered for the next plan's time estimate
+        elapsed = time.monotonic() - started
+        if self.state and self.board.transferred >= MIN_RATE_SAMPLE and elapsed > 0:
+            self.state.set_meta("throughput", self.board.transferred / elapsed)
+
+        print(f"[i] HTTP: {get_pool().stats.summary()}")
+        if self.linked:
+            modes = ", ".join(f"{n} {mode}" for mode, n in self.linked.items())
             print(
-                f"\n--- Sub-series [{si}/{total_sub}]: {ss['title']} ({total_eps} episodes) ---"
+                f"[i] Linked {sum(self.linked.values())} duplicate episodes ({modes}), "
+                f"saved {human_size(self.saved)} of downloads"
             )
+        if self.failed:
+            print(f"[!] {len(self.failed)} episodes failed:")
+            for path, error in self.failed:
+                print(f"    {path} ({error})")
+            print("[i] Run `python downloader.py retry` to try them again")
+
+
+def retry_failed(scheduler, state):
+    """
+    Queue every episode the state store has marked failed, grouped by the
+    folder it was going to. Needs nothing but the store: the server path
+    and output path of each episode are recorded there.
+    """
+    folders = {}
+    for row in state.rows("failed"):
+        folder = Path(row["path"]).parent
+        folders.setdefault(folder, []).append({"file": row["file"]})
+    for folder, episodes in folders.items():
+        scheduler.add_group(SeriesGroup(folder_title(folder), folder, episodes))
+    return sum(len(eps) for eps in folders.values())
+
+
+def folder_title(folder):
+    try:
+        return str(folder.relative_to(BASE_OUT_DIR))
+    except ValueError:
+        return str(folder)
+
+
+# -------------------- Reconcile --------------------
+
+
+def scan_tree(root):
+    """
+    {path: size} of every file under root, from a single os.scandir walk.
+    """
+    found = {}
+    stack = [str(root)]
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except FileNotFoundError:
+            continue
+        with it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                # symlinked copies (--link-mode symlink) count as files
+                elif entry.is_file():
+                    found[entry.path] = entry.stat().st_size
+    return found
+
+
+def part_written(part, on_disk):
+    """
+    Bytes of .part file part actually downloaded. A preallocated one has
+    its full size on disk from the start, so the count comes from its
+    .segments file (0 if that can't be read).
+    """
+    sidecar = part + ".segments"
+    if sidecar not in on_disk:
+        return on_disk[part]
+    segments = SegmentState.load(Path(sidecar), on_disk[part])
+    return segments.written() if segments else 0
+
+
+def reconcile(state):
+    """
+    Rebuild the download state from what is actually on disk: every episode
+    of every cached language is marked done (file present), partial (.part
+    present) or dropped from the store (nothing on disk). Failed episodes
+    stay failed, error and all, while their file is still missing, so
+    `retry` still finds them.
+    """
+    print(f"[*] Scanning {BASE_OUT_DIR} …")
+    on_disk = scan_tree(BASE_OUT_DIR)
+    previous = {r["file"]: r for r in state.rows()}
+
+    records = {}
+    claimed = set()
+    for lang, info in STRUCTURE_FILES.items():
+        if not Path(info["path"]).exists():
+            continue
+        for entry in iter_structure(lang):
+            for _, folder, episodes in plan_entry(entry, BASE_OUT_DIR / lang):
+                for ep in episodes:
+                    path = str(episode_path(ep, folder))
+                    if path in on_disk and on_disk[path] > 0:
+                        status, size = "done", on_disk[path]
+                    elif path + ".part" in on_disk:
+                        status, size = "partial", part_written(path + ".part", on_disk)
+                    else:
+                        continue
+                    claimed.update((path, path + ".part", path + ".part.segments"))
+                    # a file shared by several series: keep a finished copy
+                    if records.get(ep["file"], {}).get("status") == "done":
+                        continue
+                    record = {"file": ep["file"], "path": path, "status": status, "bytes": size}
+                    old = previous.get(ep["file"])
+                    if old is not None and old["path"] == path:
+                        record["expected"] = old["expected"]
+                        if status == "done" and old["bytes"] == size:
+                            record["sha256"] = old["sha256"]
+                    records[ep["file"]] = record
+
+    for old in previous.values():
+        if old["status"] == "failed" and old["file"] not in records and old["path"] not in on_disk:
+            records[old["file"]] = dict(old)
+
+    state.replace_all(records.values())
+
+    counts = state.counts()
+    untracked = [p for p in on_disk if p not in claimed and not os.path.basename(p).startswith(".")]
+    print(f"[✓] Files on disk : {len(on_disk)}")
+    print(f"[✓] Done          : {counts.get('done', 0)}")
+    print(f"[✓] Partial       : {counts.get('partial', 0)}")
+    print(f"[✓] Failed        : {counts.get('failed', 0)}")
+    print(f"[✓] Not in cache  : {len(untracked)}")
+
+
+# -------------------- Verify --------------------
+
+HASH_WORKERS = os.cpu_count() or 4
+TEMP_SUFFIXES = (".part", ".segments", ".tmp")
+
+
+def cache_sources():
+    """
+    {path: server file} of every episode in the structure caches on disk.
+    """
+    sources = {}
+    for lang, info in STRUCTURE_FILES.items():
+        if not Path(info["path"]).exists():
+            continue
+        for entry in iter_structure(lang):
+            for _, folder, episodes in plan_entry(entry, BASE_OUT_DIR / lang):
+                for ep in episodes:
+                    sources.setdefault(str(episode_path(ep, folder)), ep["file"])
+    return sources
+
+
+def verify_tree(state, frames=False, workers=HASH_WORKERS, fix=True):
+    """
+    Re-hash every episode file under BASE_OUT_DIR in worker processes and
+    compare it with its folder's manifest, or failing that the download
+    state. Files neither knows (e.g. from before manifests, or from an
+    older version of the downloader) must have the size the server reports
+    for the episode the structure caches put at their path before they are
+    added to the manifest; ones with no known source are added as they are.
+    With frames, MP3 files must also pass verify.mp3_ok (unless they
+    already failed it when downloaded).
+
+    Returns ({folder: [episode]}, unfixable): corrupt files and finished
+    episodes that have gone missing, to download again, and how many bad
+    files can't be because nothing says where they came from. With fix,
+    corrupt files are deleted, all of them recorded as failed and the
+    manifests updated; without, nothing is changed.
+    """
+    print(f"[*] Scanning {BASE_OUT_DIR} …")
+    on_disk = scan_tree(BASE_OUT_DIR)
+    rows = {r["path"]: r for r in state.rows()} if state else {}
+
+    manifests = {}
+
+    def manifest(folder):
+        if folder not in manifests:
+            manifests[folder] = verify.load_manifest(folder)
+        return manifests[folder]
+
+    # hard links and symlinks to the same file are hashed once
+    inodes = {}
+    for p in on_disk:
+        name = os.path.basename(p)
+        if name == verify.MANIFEST_NAME:
+            manifest(Path(p).parent)
+        if name.startswith(".") or name.endswith(TEMP_SUFFIXES):
+            continue
+        try:
+            st = os.stat(p)
+        except OSError:
+            continue
+        inodes.setdefault((st.st_dev, st.st_ino), []).append(p)
+    # biggest first, so no worker is left with a large file at the end
+    groups = sorted(inodes.values(), key=lambda paths: -on_disk[paths[0]])
+    total = sum(on_disk[paths[0]] for paths in groups)
+    count = sum(len(paths) for paths in groups)
+    linked = f", {count - len(groups)} of them links" if count > len(groups) else ""
+    print(f"[*] Hashing {count} files ({human_size(total)}{linked}) with {workers} processes …")
+
+    results = {}
+    started = last = time.monotonic()
+    hashed = 0
+    with ProcessPoolExecutor(max_workers=max(workers, 1)) as executor:
+        futures = {executor.submit(verify.check_file, paths[0], frames): paths for paths in groups}
+        for n, f in enumerate(as_completed(futures), 1):
+            paths = futures[f]
+            _, sha256, mp3, error = f.result()
+            for p in paths:
+                results[p] = (sha256, mp3, error)
+            hashed += on_disk[paths[0]]
+            now = time.monotonic()
+            if now - last >= 5:
+                print(
+                    f"    {n}/{len(groups)} files, {human_size(hashed)} "
+                    f"({human_rate(hashed / (now - started))})"
+                )
+                last = now
+    elapsed = max(time.monotonic() - started, 1e-6)
+
+    # nothing vouches for these yet: ask the server how big they should be
+    unknown = [
+        p
+        for p in results
+        if not manifest(Path(p).parent).get(Path(p).name, {}).get("sha256")
+        and not (p in rows and rows[p]["expected"])
+    ]
+    sources, server_sizes = {}, {}
+    if unknown:
+        sources = cache_sources()
+        urls = {}
+        for p in unknown:
+            file = rows[p]["file"] if p in rows else sources.get(p)
+            if file:
+                urls[p] = BASE + file
+        if urls:
+            print(f"[*] Checking the size of {len(urls)} files not in a manifest …")
+            server_sizes = fetch_sizes(urls, PLAN_WORKERS)
+
+    bad = {}  # path -> (server file or None, problem)
+    adopted = 0
+    changed = set()
+    for p, (sha256, mp3, error) in results.items():
+        path = Path(p)
+        entry = manifest(path.parent).get(path.name) or {}
+        row = rows.get(p)
+        file = entry.get("file") or (row["file"] if row else None) or sources.get(p)
+        want_sha = entry.get("sha256") or (row["sha256"] if row else None)
+        want_size = entry.get("size") or (row["expected"] if row else None) or server_sizes.get(p)
+        if error:
+            bad[path] = (file, f"unreadable: {error}")
+        elif want_size and on_disk[p] != want_size:
+            bad[path] = (file, f"{human_size(on_disk[p])} of {human_size(want_size)}")
+        elif want_sha and sha256 != want_sha:
+            bad[path] = (file, "checksum mismatch")
+        elif mp3 is False and entry.get("mp3") is not False:
+            bad[path] = (file, "not a valid MP3")
+        elif not entry.get("sha256"):
+            manifest(path.parent)[path.name] = verify.entry_for(file, on_disk[p], sha256, mp3)
+            changed.add(path.parent)
+            adopted += 1
+
+    missing = {}
+    for folder, entries in manifests.items():
+        for name, entry in entries.items():
+            if str(folder / name) not in on_disk:
+                missing[folder / name] = (entry.get("file"), "missing")
+    for row in state.rows("done") if state else ():
+        if row["path"] not in on_disk:
+            missing.setdefault(Path(row["path"]), (row["file"], "missing"))
+
+    print(
+        f"[✓] Verified {len(results)} files, {human_size(total)} in {human_time(elapsed)} "
+        f"({human_rate(total / elapsed)})"
+    )
+    print(f"[✓] OK        : {len(results) - len(bad)}")
+    if adopted:
+        print(f"[+] Added     : {adopted} (not in a manifest yet)")
+    print(f"[!] Corrupt   : {len(bad)}")
+    print(f"[!] Missing   : {len(missing)}")
+
+    queue = {}
+    unfixable = 0
+    for path, (file, problem) in {**bad, **missing}.items():
+        if not file:
+            print(f"    {path}: {problem} (source unknown, left as is)")
+            unfixable += 1
+            continue
+        print(f"    {path}: {problem}")
+        queue.setdefault(path.parent, []).append({"file": file})
+        if not fix:
+            continue
+        path.unlink(missing_ok=True)
+        if manifest(path.parent).pop(path.name, None) is not None:
+            changed.add(path.parent)
+        state.failed(file, path, None, error=f"verify: {problem}")
+
+    if fix:
+        for folder in changed:
+            verify.save_manifest(folder, manifests[folder])
+    return queue, unfixable
+
+
+def run_verify(args):
+    """
+    The verify command: check the tree, then download again what is
+    corrupt or missing. Returns the exit status.
+    """
+    state = open_state(args)
+    try:
+        queue, unfixable = verify_tree(state, args.frames, args.hash_workers, fix=not args.dry_run)
+    finally:
+        if state:
+            state.close()
+    if not queue:
+        return 1 if unfixable else 0
+    count = sum(len(eps) for eps in queue.values())
+    if args.dry_run:
+        print(f"[*] Dry run: {count} episodes would be downloaded again")
+        return 1
+
+    print(f"[*] Downloading {count} episodes again")
+    scheduler = make_scheduler(args)
+    for folder, episodes in queue.items():
+        entry = {"title": folder_title(folder), "slug": folder.name, "episodes": episodes}
+        scheduler.add_entry(entry, folder.parent)
+    status = execute(scheduler, args)
+    return 1 if unfixable else status
+
+
+# -------------------- Batch Mode --------------------
+
+# in the order the global search menu lists them
+LANGS = ("hindi", "english")
+JOB_KEYS = {"lang", "regex", "select", "episodes"}
+
+
+def parse_selection(spec, count):
+    """
+    0-based indexes picked by a 1-based selection: "all", "3", "1,4,7-9"
+    or "10-" (open-ended), or a list of numbers from a job file. None (an
+    option not given) means all; an empty answer selects nothing. Numbers
+    past count are ignored.
+    """
+    if spec is None or str(spec).strip().lower() == "all":
+        return list(range(count))
+    if not str(spec).strip():
+        return []
+    items = spec if isinstance(spec, list) else str(spec).split(",")
+    picked = []
+    for item in items:
+        item = str(item).strip()
+        m = re.fullmatch(r"(\d+)(?:\s*-\s*(\d*))?", item)
+        if not m:
+            raise ValueError(f"invalid selection: {item!r}")
+        first = int(m.group(1))
+        if m.group(2) is None:
+            last = first
+        else:
+            last = int(m.group(2)) if m.group(2) else count
+        picked.extend(i - 1 for i in range(first, last + 1) if 1 <= i <= count)
+    return list(dict.fromkeys(picked))
 
-            progress = SeriesProgress(total_eps)
-            folder = out_dir / entry["slug"] / ss["slug"]
-
-            with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-                futures = [
-                    executor.submit(
-                        download_episode, ep, folder, i, total_eps, progress
-                    )
-                    for i, ep in enumerate(episodes, 1)
-                ]
-                for f in as_completed(futures):
-                    f.result()
 
-    # Case 2: normal series (ALL English + most Hindi)
-    else:
-        episodes = entry["episodes"]
-        total_eps = len(episodes)
+def filter_episodes(entry, spec):
+    """
+    Copy of a cache entry keeping only the selected episodes (numbered per
+    series, or per sub-series of a container).
+    """
+    def pick(episodes):
+        return [episodes[i] for i in parse_selection(spec, len(episodes))]
 
-        progress = SeriesProgress(total_eps)
-        folder = out_dir / entry["slug"]
+    entry = dict(entry)
+    if "subseries" in entry:
+        entry["subseries"] = [
+            {**ss, "episodes": pick(ss["episodes"])} for ss in entry["subseries"]
+        ]
+        entry["subseries"] = [ss for ss in entry["subseries"] if ss["episodes"]]
+    else:
+        entry["episodes"] = pick(entry["episodes"])
+    return entry
+
+
+def resolve_target(lang=None, regex=None, select=None, episodes=None):
+    """
+    [(lang, entry)] for one batch target: series of lang ("all" or None for
+    both) whose title matches regex, narrowed by select (positions in that
+    match list) and episodes. Matches are numbered like the series hits of
+    the interactive menus, Hindi first for both languages; sub-series and
+    episode hits, which the global search lists after them, aren't matches.
+    """
+    rx = re.compile(regex or "", re.I)
+    langs = LANGS if lang in (None, "all") else (lang,)
+    with ExitStack() as catalogs:
+        matches = []
+        for l in langs:
+            titles, entry = catalogs.enter_context(series_index(l))
+            matches.extend((l, entry, i) for i, title in enumerate(titles) if rx.search(title))
+        picked = []
+        for k in parse_selection(select, len(matches)):
+            l, entry, i = matches[k]
+            picked.append((l, entry(i)))
+    if episodes is not None:
+        picked = [(l, filter_episodes(s, episodes)) for l, s in picked]
+    return picked
+
+
+def load_job(path):
+    """
+    Targets and options from a job file: JSON, or YAML if PyYAML is
+    installed. Either a list of targets or a mapping with "targets" and
+    optional "out" / "workers".
+    """
+    path = Path(path)
+    text = path.read_text(encoding="utf-8")
+    if path.suffix.lower() in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError("YAML job files need PyYAML (pip install pyyaml); use JSON instead")
+        job = yaml.safe_load(text)
+    else:
+        job = json.loads(text)
+
+    if isinstance(job, list):
+        job = {"targets": job}
+    if not isinstance(job, dict) or not isinstance(job.get("targets"), list):
+        raise ValueError("expected a list of targets or a mapping with 'targets'")
+    for t in job["targets"]:
+        if not isinstance(t, dict):
+            raise ValueError(f"target must be a mapping: {t!r}")
+        unknown = set(t) - JOB_KEYS
+        if unknown:
+            raise ValueError(f"unknown target keys {sorted(unknown)} in {t!r}")
+        if t.get("lang") not in (None, "all", *LANGS):
+            raise ValueError(f"unknown lang {t['lang']!r}")
+    return job
+
+
+def run_batch(args, specs):
+    """
+    Download every target in specs (dicts of resolve_target arguments) in
+    one scheduler run. Returns the exit status.
+    """
+    needed = set()
+    for spec in specs:
+        needed.update(LANGS if spec.get("lang") in (None, "all") else (spec["lang"],))
+    builds = {lang: start_cache_build(lang) for lang in LANGS if lang in needed}
+    for lang, proc in builds.items():
+        if not ensure_cache(lang, proc):
+            return 1
+
+    targets = []
+    for spec in specs:
+        try:
+            found = resolve_target(**spec)
+        except (re.error, ValueError) as e:
+            print(f"[!] {e} in target {spec}")
+            return 2
+        if not found:
+            print(f"[!] Nothing matched target {spec}")
+        targets.extend(found)
+
+    if not targets:
+        print("[!] No matches found")
+        return 1
+
+    scheduler = make_scheduler(args)
+    for lang, entry in targets:
+        scheduler.add_entry(entry, BASE_OUT_DIR / lang)
+    return execute(scheduler, args)
+
+
+def execute(scheduler, args):
+    """
+    Plan, check the disk and (unless --dry-run) download. Returns the exit
+    status.
+    """
+    if args.dry_run:
+        scheduler.print_plan()
+    trimmed = False
+    if scheduler.jobs and not args.no_plan:
+        plan = scheduler.plan(remember=not args.dry_run)
+        for line in plan.summary():
+            print(line)
+        if not plan.fits():
+            print(
+                f"[!] Not enough disk space: {human_size(plan.disk)} needed, "
+                f"{human_size(plan.available)} usable"
+            )
+            if args.on_low_disk == "refuse":
+                return 1
+            kept = plan.trim()
+            print(
+                f"[!] Trimmed to the first {len(kept)} of {len(plan.items)} episodes; "
+                "run again once there is room for the rest"
+            )
+            scheduler.trim([item.job for item in kept])
+            trimmed = True
+    if args.dry_run:
+        return 0
+    scheduler.run()
+    return 1 if scheduler.failed or trimmed else 0
 
-        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-            futures = [
-                executor.submit(download_episode, ep, folder, i, total_eps, progress)
-                for i, ep in enumerate(episodes, 1)
-            ]
-            for f in as_completed(futures):
-                f.result()
 
-    print(f"=== Finished: {entry['title']} ===\n")
+# -------------------- CLI --------------------
 
 
-# -------------------- CLI --------------------
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Download Osho discourses from oshoworld.com. Without "
+        "--lang / --regex / --select / --episodes / --job it asks interactively."
+    )
+    batch = parser.add_argument_group("batch mode")
+    batch.add_argument(
+        "--lang", choices=["english", "hindi", "all"], help="language to pick series from"
+    )
+    batch.add_argument("--regex", help="series whose title matches this regex")
+    batch.add_argument(
+        "--select",
+        metavar="SPEC",
+        help='series to download, numbered as the menu numbers its series hits '
+        '(Hindi first with both languages): "all" (default), "1,3,5-7"',
+    )
+    batch.add_argument(
+        "--episodes",
+        metavar="SPEC",
+        help='episodes of each selected series (or sub-series): "1-5,9", "10-"',
+    )
+    batch.add_argument(
+        "--job",
+        metavar="FILE",
+        help="JSON or YAML file listing targets (keys lang, regex, select, episodes), "
+        "all downloaded in one run",
+    )
+    parser.add_argument(
+        "--out",
+        metavar="DIR",
+        help=f"download directory (default {BASE_OUT_DIR})",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="show what would be downloaded and exit",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="fixed number of parallel downloads (same as equal --min/--max-workers)",
+    )
+    parser.add_argument(
+        "--min-workers",
+        type=int,
+        default=MIN_WORKERS,
+        help=f"lowest number of parallel downloads (default {MIN_WORKERS})",
+    )
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        default=MAX_WORKERS,
+        help=f"highest number of parallel downloads (default {MAX_WORKERS})",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=RETRIES,
+        help=f"attempts per episode before it is recorded as failed (default {RETRIES})",
+    )
+    parser.add_argument(
+        "--segments",
+        type=int,
+        metavar="N",
+        default=SEGMENTS,
+        help=f"download episodes of {SEGMENT_MIN_SIZE // 1048576} MB or more over N "
+        f"connections at once (1-{MAX_SEGMENTS}, default {SEGMENTS})",
+    )
+    parser.add_argument(
+        "--no-plan",
+        action="store_true",
+        help="start downloading without first sizing the episodes and checking disk space",
+    )
+    parser.add_argument(
+        "--on-low-disk",
+        choices=["trim", "refuse"],
+        default="trim",
+        help="if the plan doesn't fit on disk, download only what fits (default) or nothing",
+    )
+    parser.add_argument(
+        "--link-mode",
+        choices=LINK_MODES,
+        default="hardlink",
+        help="how an episode listed under several series is put in the other "
+        "folders after downloading it once (default hardlink; falls back to copy)",
+    )
+    parser.add_argument(
+        "--limit-rate",
+        metavar="RATE",
+        help='cap total download bandwidth, e.g. "2M", or a schedule such as '
+        '"08:00-18:00=1M,*=0" (0 = unlimited)',
+    )
+    parser.add_argument(
+        "--limit-file",
+        metavar="PATH",
+        help="read the cap (same syntax) from a file, re-read whenever it "
+        "changes while downloading; overrides --limit-rate while it exists",
+    )
+    check = parser.add_argument_group("verify")
+    check.add_argument(
+        "--frames",
+        action="store_true",
+        help="also check that MP3 files start with valid frames and don't end in zeros",
+    )
+    check.add_argument(
+        "--hash-workers",
+        type=int,
+        metavar="N",
+        default=HASH_WORKERS,
+        help=f"processes hashing files (default {HASH_WORKERS}, one per CPU)",
+    )
+    parser.add_argument(
+        "command",
+        nargs="?",
+        default="download",
+        choices=["download", "retry", "reconcile", "verify"],
+        help="download (interactive, default), retry the episodes that failed "
+        "last time, reconcile the download state with disk, or verify "
+        "downloaded files against their checksums and fetch bad ones again",
+    )
+    metrics.add_arguments(parser)
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    if args.limit_rate:
+        try:
+            args.limit_rate = Schedule(args.limit_rate)
+        except ValueError as e:
+            parser.error(f"--limit-rate: {e}")
+    if args.workers:
+        args.min_workers = args.max_workers = args.workers
+    if not 1 <= args.segments <= MAX_SEGMENTS:
+        parser.error(f"--segments must be between 1 and {MAX_SEGMENTS}")
+    if args.select:
+        try:
+            parse_selection(args.select, 0)
+        except ValueError as e:
+            parser.error(f"--select: {e}")
+    if args.episodes:
+        try:
+            parse_selection(args.episodes, 0)
+        except ValueError as e:
+            parser.error(f"--episodes: {e}")
+    return args
+
+
+def open_state(args):
+    """
+    The download state store. A dry run only reads one that already exists
+    (None if there is none yet), so it leaves nothing behind.
+    """
+    path = BASE_OUT_DIR / STATE_NAME
+    if args.dry_run and not path.exists():
+        return None
+    return DownloadState(path)
+
+
+def make_scheduler(args):
+    bandwidth = None
+    if args.limit_rate or args.limit_file:
+        bandwidth = BandwidthLimiter(args.limit_rate, args.limit_file)
+    return DownloadScheduler(
+        workers=args.workers or WORKERS,
+        min_workers=args.min_workers,
+        max_workers=args.max_workers,
+        state=open_state(args),
+        bandwidth=bandwidth,
+        retries=max(args.retries, 1),
+        link_mode=args.link_mode,
+    )
 
 
 def main():
+    global BASE_OUT_DIR, SEGMENTS
+    args = parse_args()
+    SEGMENTS = args.segments
+    metrics.start(args, "downloader")
+    profiling.start(args, "downloader")
+
+    job = None
+    if args.job:
+        try:
+            job = load_job(args.job)
+        except (OSError, ValueError) as e:
+            print(f"[!] Can't use job file {args.job}: {e}")
+            return 2
+        # command-line options win over the job file
+        if job.get("workers") and not args.workers:
+            args.workers = args.min_workers = args.max_workers = int(job["workers"])
+        if job.get("out") and not args.out:
+            args.out = job["out"]
+    if args.out:
+        BASE_OUT_DIR = Path(args.out)
+
+    if args.command == "reconcile":
+        state = DownloadState(BASE_OUT_DIR / STATE_NAME)
+        reconcile(state)
+        state.close()
+        return
 
-    ensure_cache("hindi")
-    ensure_cache("english")
+    # Every worker (and every segment of a segmented download) holds one
+    # connection, so size the shared pool to match.
+    configure_http(pool_size=args.max_workers * SEGMENTS)
+
+    if args.command == "verify":
+        return run_verify(args)
+
+    if args.command == "retry":
+        scheduler = make_scheduler(args)
+        if not scheduler.state or not retry_failed(scheduler, scheduler.state):
+            print("[✓] No failed episodes to retry")
+            return
+        return execute(scheduler, args)
+
+    specs = list(job["targets"]) if job else []
+    if args.lang or args.regex is not None or args.select or args.episodes:
+        specs.append(
+            {
+                "lang": args.lang,
+                "regex": args.regex,
+                "select": args.select,
+                "episodes": args.episodes,
+            }
+        )
+    if specs:
+        return run_batch(args, specs)
 
     print("=" * 40)
     print("        OSHO DISCOURSE DOWNLOADER")
@@ -220,41 +1666,42 @@ def main():
     print("-" * 40)
     mode = input("> ").strip()
     if mode == "3":
+        # Missing caches build in the background while the user types
+        builds = {lang: start_cache_build(lang) for lang in ("hindi", "english")}
         rx = re.compile(input("Regex (global): "), re.I)
+        for lang, proc in builds.items():
+            ensure_cache(lang, proc)
 
-        hindi_series = load_structure("hindi")
-        english_series = load_structure("english")
-
-        all_items = []
-        for s in hindi_series:
-            all_items.append(("hindi", s))
-        for s in english_series:
-            all_items.append(("english", s))
-
-        matches = [(lang, s) for lang, s in all_items if rx.search(s["title"])]
+        matches = global_search(rx)
 
         if not matches:
             print("[!] No matches found")
             return
 
-        for i, (lang, s) in enumerate(matches, 1):
-            print(f"[{i}] ({lang.upper()}) {s['title']}")
-
-        sel = input("Select (comma or all): ").strip()
+        for i, (label, _) in enumerate(matches, 1):
+            print(f"[{i}] {label}")
 
-        if sel.lower() == "all":
-            targets = matches
-        else:
-            idxs = [int(x) - 1 for x in sel.split(",") if x.isdigit()]
-            targets = [matches[i] for i in idxs if 0 <= i < len(matches)]
+        sel = input("Select (comma, ranges or all): ").strip()
+        try:
+            picked = [matches[i] for i in parse_selection(sel, len(matches))]
+        except ValueError as e:
+            print(f"[!] {e}")
+            return
+        if not picked:
+            print("[!] Nothing selected")
+            return
+        targets = [load() for _, load in picked]
 
+        scheduler = make_scheduler(args)
         for lang, entry in targets:
-            out_dir = BASE_OUT_DIR / lang
-            out_dir.mkdir(parents=True, exist_ok=True)
-            download_entry(entry, out_dir)
-            print(f"Downloaded in ./{out_dir}/{entry['slug']}\n")
+            scheduler.add_entry(entry, BASE_OUT_DIR / lang)
+        status = execute(scheduler, args)
 
-        return
+        if not args.dry_run:
+            for folder in dict.fromkeys(f"{BASE_OUT_DIR / lang}/{e['slug']}" for lang, e in targets):
+                print(f"Downloaded in ./{folder}")
+
+        return status
 
     if mode == "1":
         lang = "english"
@@ -264,41 +1711,43 @@ def main():
         print("Invalid choice")
         return
 
-    structure_file = STRUCTURE_FILES[lang]["path"]
+    if not ensure_cache(lang):
+        return
 
     OUT_DIR = BASE_OUT_DIR / lang
-    OUT_DIR.mkdir(parents=True, exist_ok=True)
 
-    # ensure_cache(lang)
-    series = load_structure(lang)
-
-    print("1. Regex search")
-    print("2. List all")
-    choice = input("> ").strip()
-    if choice == "1":
-        rx = re.compile(input("Regex: "), re.I)
-        picks = [s for s in series if rx.search(s["title"])]
-    else:
-        picks = series
-
-    for i, s in enumerate(picks, 1):
-        print(f"[{i}] {s['title']}")
+    with series_index(lang) as (titles, entry):
+        print("1. Regex search")
+        print("2. List all")
+        choice = input("> ").strip()
+        if choice == "1":
+            rx = re.compile(input("Regex: "), re.I)
+            picks = [i for i, title in enumerate(titles) if rx.search(title)]
+        else:
+            picks = list(range(len(titles)))
 
-    sel = input("Select (comma or all): ").strip()
+        for n, i in enumerate(picks, 1):
+            print(f"[{n}] {titles[i]}")
 
-    if sel.lower() == "all":
-        targets = picks
-    else:
-        idxs = [int(x) - 1 for x in sel.split(",") if x.strip().isdigit()]
-        targets = [picks[i] for i in idxs if 0 <= i < len(picks)]
+        sel = input("Select (comma, ranges or all): ").strip()
+        try:
+            targets = [entry(picks[k]) for k in parse_selection(sel, len(picks))]
+        except ValueError as e:
+            print(f"[!] {e}")
+            return
+    if not targets:
+        print("[!] Nothing selected")
+        return
 
+    scheduler = make_scheduler(args)
     for entry in targets:
-        download_entry(entry, OUT_DIR)
+        scheduler.add_entry(entry, OUT_DIR)
+    return execute(scheduler, args)
 
 
 if __name__ == "__main__":
     try:
-        main()
+        sys.exit(main())
     except KeyboardInterrupt:
         print("\n[!] Interrupted by user. Exiting cleanly.")
         sys.exit(0)
@@ -0,0 +1,3 @@
+"""
+Shared helpers for downloader.py and the structure cache tools.
+"""
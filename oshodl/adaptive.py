@@ -0,0 +1,170 @@
+"""
+Adaptive control of how many episodes download at once.
+
+Workers take a slot from the AdaptiveLimiter before downloading and report
+bytes and failures as they go. A controller thread looks at each interval's
+aggregate throughput and error rate and moves the limit AIMD-style:
+
+  * any 429 / 5xx / connection error  -> halve the limit
+    (other failures, like a 404 or a full disk, don't count)
+  * all slots busy, no recent probe   -> one more worker
+  * the last increase paid off        -> one more worker
+  * the last increase made it slower  -> step back and hold for a while
+  * the last increase changed nothing -> hold for a while
+
+Throughput is smoothed over intervals, since bytes arrive in whole chunks.
+
+stop() also cancels: workers still waiting for a slot, and any that ask
+for one later, get Cancelled instead.
+"""
+
+import threading
+import time
+
+MIN_WORKERS = 1
+MAX_WORKERS = 16
+INTERVAL = 10.0  # seconds between decisions
+GAIN = 0.05  # an extra worker must add at least 5% throughput
+COOLDOWN = 3  # intervals to hold after a probe that didn't pay off
+SMOOTHING = 0.5  # weight of the newest interval in the throughput average
+
+
+class Cancelled(Exception):
+    """
+    Raised by acquire() once the limiter has been stopped.
+    """
+
+
+class AdaptiveLimiter:
+    def __init__(
+        self,
+        initial,
+        minimum=MIN_WORKERS,
+        maximum=MAX_WORKERS,
+        interval=INTERVAL,
+        log=print,
+    ):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = max(minimum, min(initial, maximum))
+        self.interval = interval
+        self.log = log
+
+        self.active = 0
+        self._cond = threading.Condition()
+
+        self._bytes = 0
+        self._throttled = 0
+        self._errors = 0
+        self._stats_lock = threading.Lock()
+
+        self._last_limit = self.limit
+        self._last_rate = None
+        self._cooldown = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    # -------------------- slots --------------------
+
+    @property
+    def cancelled(self):
+        return self._stop.is_set()
+
+    def acquire(self):
+        with self._cond:
+            while self.active >= self.limit and not self.cancelled:
+                self._cond.wait()
+            if self.cancelled:
+                raise Cancelled("download cancelled")
+            self.active += 1
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    # -------------------- reports from workers --------------------
+
+    def record_bytes(self, n):
+        with self._stats_lock:
+            self._bytes += n
+
+    def record_throttled(self):
+        """
+        A 429 or 5xx answer: the server wants fewer requests.
+        """
+        with self._stats_lock:
+            self._throttled += 1
+
+    def record_error(self):
+        with self._stats_lock:
+            self._errors += 1
+
+    # -------------------- controller --------------------
+
+    def start(self):
+        if self.minimum == self.maximum:
+            return
+        self._thread = threading.Thread(target=self._loop, name="adaptive", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stop.set()
+            self._cond.notify_all()
+
+    def _loop(self):
+        last = time.monotonic()
+        while not self._stop.wait(self.interval):
+            now = time.monotonic()
+            self._decide(now - last)
+            last = now
+
+    def _set_limit(self, limit):
+        with self._cond:
+            self.limit = limit
+            self._cond.notify_all()
+
+    def _decide(self, elapsed):
+        with self._stats_lock:
+            sample = self._bytes / elapsed if elapsed > 0 else 0.0
+            throttled, errors = self._throttled, self._errors
+            self._bytes = self._throttled = self._errors = 0
+
+        last = self._last_rate
+        rate = sample if last is None else SMOOTHING * sample + (1 - SMOOTHING) * last
+
+        old = self.limit
+        new = old
+        if throttled or errors:
+            new = max(self.minimum, old // 2)
+            reason = f"{throttled} throttled, {errors} errors"
+        elif self._cooldown:
+            self._cooldown -= 1
+            reason = "holding"
+        elif last is not None and old > self._last_limit and rate < last * (1 - GAIN):
+            new = max(self.minimum, old - 1)
+            self._cooldown = COOLDOWN
+            reason = "last increase made it slower"
+        elif last is not None and old > self._last_limit and rate < last * (1 + GAIN):
+            self._cooldown = COOLDOWN
+            reason = "last increase didn't help"
+        elif self.active < old:
+            reason = "not all slots busy"
+        else:
+            new = min(self.maximum, old + 1)
+            reason = "probing for more throughput"
+
+        self._last_limit = old
+        self._last_rate = rate
+        self._set_limit(new)
+        self.log(
+            f"[~] Workers {old} → {new} ({rate / 1048576:.1f} MB/s; {reason})"
+        )
@@ -0,0 +1,156 @@
+"""
+Helpers shared by the structure cache builders: reading an existing cache,
+journaling finished work so an interrupted crawl can resume, writing the
+final file atomically, and recording what an incremental refresh added.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from oshodl import profiling
+
+
+def load_cache(path):
+    """
+    Parsed contents of an existing cache file, or None if there isn't a
+    usable one.
+    """
+    path = Path(path)
+    if not path.exists():
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f, profiling.stage("json"):
+            return json.load(f)
+    except ValueError:
+        print(f"[!] Existing cache {path} is not valid JSON, ignoring it")
+        return None
+
+
+def write_json_atomic(path, data):
+    """
+    Write data as indented JSON to a temp file next to path, fsync it and
+    rename it into place, so readers only ever see the old or the new file.
+    """
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f, profiling.stage("disk"):
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+class Journal:
+    """
+    Append-only JSON-lines log of finished crawl units (a series, or one
+    sub-series of a container), written to <cache>.journal.jsonl as each
+    unit completes. A restarted build loads it and skips those units; the
+    journal is removed once the final cache has been written.
+    """
+
+    def __init__(self, out_file, enabled=True):
+        out_file = Path(out_file)
+        self.path = out_file.with_name(out_file.stem + ".journal.jsonl")
+        self.entries = {}
+        self._lock = threading.Lock()
+        if enabled:
+            self._load()
+        else:
+            self.discard()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        text = self.path.read_text(encoding="utf-8")
+        for line in text.splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # torn last line from a crash mid-write
+                continue
+            self.entries[record["key"]] = record["value"]
+        if text and not text.endswith("\n"):
+            # keep the next record off the torn line
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n")
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def record(self, key, value):
+        line = json.dumps({"key": key, "value": value}, ensure_ascii=False)
+        with self._lock, profiling.stage("disk"):
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.entries[key] = value
+
+    def discard(self):
+        self.path.unlink(missing_ok=True)
+        self.entries = {}
+
+
+def changelog_path(out_file):
+    out_file = Path(out_file)
+    return out_file.with_name(out_file.stem + ".changelog.jsonl")
+
+
+def added_episodes(old_episodes, new_episodes):
+    """
+    Episodes in new_episodes whose file isn't in old_episodes, in order.
+    """
+    known = {ep.get("file") for ep in old_episodes or []}
+    return [ep for ep in new_episodes if ep.get("file") not in known]
+
+
+class Changelog:
+    """
+    Collects episodes added by an update run and appends them as one JSON
+    line per series (or sub-series) to <cache>.changelog.jsonl.
+    """
+
+    def __init__(self, out_file, language):
+        self.path = changelog_path(out_file)
+        self.language = language
+        self.records = []
+
+    def add(self, series, episodes, subseries=None, new_series=False):
+        if not episodes and not new_series:
+            return
+        record = {"language": self.language, "series": series}
+        if subseries is not None:
+            record["subseries"] = subseries
+        if new_series:
+            record["new"] = True
+        record["added"] = [
+            {"title": ep.get("title"), "file": ep.get("file")} for ep in episodes
+        ]
+        self.records.append(record)
+
+    def episode_count(self):
+        return sum(len(r["added"]) for r in self.records)
+
+    def write(self):
+        if not self.records:
+            return
+        stamp = time.strftime("%Y-%m-%dT%H:%M:%S")
+        with open(self.path, "a", encoding="utf-8") as f:
+            for record in self.records:
+                f.write(json.dumps({"time": stamp, **record}, ensure_ascii=False))
+                f.write("\n")
@@ -0,0 +1,336 @@
+"""
+SQLite index of the structure caches.
+
+Series, sub-series and episodes from both languages are imported into one
+database with an FTS5 table over their titles and descriptions, so global
+search is a query instead of a scan over the parsed JSON. The index is
+rebuilt automatically whenever a structure cache changes on disk.
+"""
+
+import functools
+import os
+import re
+import sqlite3
+from collections import namedtuple
+from pathlib import Path
+
+CATALOG_FILE = Path("catalog.db")
+EPISODE_HIT_LIMIT = 100
+# searches FTS can answer: words, optionally |-separated alternatives
+PLAIN_WORDS = re.compile(r"\s*\w+(\s+\w+)*\s*(\|\s*\w+(\s+\w+)*\s*)*")
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE series (
+    id INTEGER PRIMARY KEY,
+    lang TEXT NOT NULL,
+    parent INTEGER REFERENCES series(id),
+    position INTEGER NOT NULL,
+    kind TEXT NOT NULL,  -- series | container | subseries
+    title TEXT NOT NULL,
+    slug TEXT NOT NULL
+);
+CREATE INDEX series_parent ON series(parent, position);
+CREATE TABLE episodes (
+    id INTEGER PRIMARY KEY,
+    series INTEGER NOT NULL REFERENCES series(id),
+    position INTEGER NOT NULL,
+    title TEXT,
+    slug TEXT,
+    duration TEXT,
+    file TEXT,
+    description TEXT
+);
+CREATE INDEX episodes_series ON episodes(series, position);
+CREATE VIRTUAL TABLE search USING fts5(
+    kind UNINDEXED, ref UNINDEXED, title, description,
+    tokenize = "unicode61 remove_diacritics 2"
+);
+"""
+
+# kind is "series", "subseries" or "episode"; context names the parent(s)
+Hit = namedtuple("Hit", "kind id lang title context")
+
+
+def fts5_available():
+    try:
+        sqlite3.connect(":memory:").execute("CREATE VIRTUAL TABLE t USING fts5(x)")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+@functools.lru_cache(maxsize=32)
+def _compile(pattern):
+    return re.compile(pattern, re.I)
+
+
+def _regexp(pattern, value):
+    return value is not None and _compile(pattern).search(value) is not None
+
+
+def _strip_html(text):
+    return re.sub(r"<[^>]+>", " ", text or "")
+
+
+def _stamp(path):
+    st = os.stat(path)
+    return f"{st.st_mtime_ns}:{st.st_size}"
+
+
+# -----------------------------
+# building
+# -----------------------------
+def build_catalog(db_path, files, load):
+    """
+    Import every language in files ({lang: cache path}) into a fresh
+    database at db_path. load(lang) returns that language's series list.
+    The database is built under a temp name and renamed into place.
+    """
+    db_path = Path(db_path)
+    tmp = db_path.with_name(db_path.name + ".tmp")
+    tmp.unlink(missing_ok=True)
+
+    conn = sqlite3.connect(tmp)
+    try:
+        conn.executescript(SCHEMA)
+        for lang, path in files.items():
+            for pos, s in enumerate(load(lang)):
+                _import_series(conn, lang, pos, s)
+            conn.execute(
+                "INSERT INTO meta VALUES (?, ?)", (f"source:{lang}", _stamp(path))
+            )
+        conn.commit()
+    finally:
+        conn.close()
+
+    os.replace(tmp, db_path)
+
+
+def _add_series(conn, lang, parent, pos, kind, title, slug):
+    cur = conn.execute(
+        "INSERT INTO series (lang, parent, position, kind, title, slug)"
+        " VALUES (?, ?, ?, ?, ?, ?)",
+        (lang, parent, pos, kind, title, slug),
+    )
+    conn.execute(
+        "INSERT INTO search (kind, ref, title, description) VALUES (?, ?, ?, '')",
+        ("subseries" if parent else "series", cur.lastrowid, title),
+    )
+    return cur.lastrowid
+
+
+def _add_episodes(conn, series_id, episodes):
+    for pos, ep in enumerate(episodes):
+        cur = conn.execute(
+            "INSERT INTO episodes"
+            " (series, position, title, slug, duration, file, description)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                series_id,
+                pos,
+                ep.get("title"),
+                ep.get("slug"),
+                ep.get("duration"),
+                ep.get("file"),
+                ep.get("description"),
+            ),
+        )
+        conn.execute(
+            "INSERT INTO search (kind, ref, title, description)"
+            " VALUES ('episode', ?, ?, ?)",
+            (cur.lastrowid, ep.get("title") or "", _strip_html(ep.get("description"))),
+        )
+
+
+def _import_series(conn, lang, pos, s):
+    if "subseries" in s:
+        sid = _add_series(conn, lang, None, pos, "container", s["title"], s["slug"])
+        for j, ss in enumerate(s["subseries"]):
+            sub = _add_series(conn, lang, sid, j, "subseries", ss["title"], ss["slug"])
+            _add_episodes(conn, sub, ss["episodes"])
+    else:
+        sid = _add_series(conn, lang, None, pos, "series", s["title"], s["slug"])
+        _add_episodes(conn, sid, s["episodes"])
+
+
+def is_stale(db_path, files):
+    """
+    True if db_path is missing or was built from different cache files.
+    """
+    if not Path(db_path).exists():
+        return True
+    conn = sqlite3.connect(db_path)
+    try:
+        stamps = dict(conn.execute("SELECT key, value FROM meta"))
+    except sqlite3.DatabaseError:
+        return True
+    finally:
+        conn.close()
+    wanted = {f"source:{lang}": _stamp(path) for lang, path in files.items()}
+    return stamps != wanted
+
+
+def open_catalog(db_path, files, load):
+    """
+    Open the catalog, (re)building it first if the caches changed.
+    """
+    if is_stale(db_path, files):
+        print("[*] Indexing structure cache for search …")
+        build_catalog(db_path, files, load)
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    conn.create_function("regexp", 2, _regexp, deterministic=True)
+    return conn
+
+
+# -----------------------------
+# queries
+# -----------------------------
+def fts_query(text):
+    """
+    Turn a user search into an FTS5 query: alternatives separated by | are
+    OR-ed, words within one are AND-ed prefix matches. None unless text is
+    plain words, the only kind of regex whose word-start matches FTS can
+    find; anything else (character classes, wildcards, ...) has no FTS
+    equivalent.
+    """
+    if not PLAIN_WORDS.fullmatch(text):
+        return None
+    alternatives = []
+    for alt in text.split("|"):
+        terms = " ".join(f'"{w}"*' for w in alt.split())
+        alternatives.append(f"({terms})")
+    return " OR ".join(alternatives)
+
+
+def search_series(conn, pattern, lang=None):
+    """
+    Top-level series whose title matches regex pattern, in cache order.
+    """
+    sql = (
+        "SELECT id, lang, title FROM series"
+        " WHERE parent IS NULL AND title REGEXP ?"
+    )
+    args = [pattern]
+    if lang:
+        sql += " AND lang = ?"
+        args.append(lang)
+    sql += " ORDER BY lang = 'english', position"
+    return [Hit("series", r["id"], r["lang"], r["title"], "") for r in conn.execute(sql, args)]
+
+
+def search_text(conn, text, limit=EPISODE_HIT_LIMIT):
+    """
+    Sub-series and episodes whose title or description match regex text.
+    For plain words the FTS index finds the word-start matches, best first;
+    the rest (matches inside words, or every match of any other regex) come
+    from a REGEXP scan, in cache order.
+    """
+    rows = []
+    query = fts_query(text)
+    if query:
+        rows = conn.execute(
+            "SELECT kind, ref FROM search WHERE search MATCH ?"
+            " AND kind != 'series' AND (title REGEXP ? OR description REGEXP ?)"
+            " ORDER BY rank LIMIT ?",
+            (query, text, text, limit),
+        ).fetchall()
+    if len(rows) < limit:
+        seen = {(r["kind"], r["ref"]) for r in rows}
+        scan = conn.execute(
+            "SELECT kind, ref FROM search WHERE kind != 'series'"
+            " AND (title REGEXP ? OR description REGEXP ?) ORDER BY rowid LIMIT ?",
+            (text, text, limit + len(rows)),
+        )
+        rows += [r for r in scan if (r["kind"], r["ref"]) not in seen][: limit - len(rows)]
+
+    hits = []
+    for row in rows:
+        if row["kind"] == "episode":
+            ep = conn.execute(
+                "SELECT title, series FROM episodes WHERE id = ?", (row["ref"],)
+            ).fetchone()
+            s = _series_row(conn, ep["series"])
+            hits.append(Hit("episode", row["ref"], s["lang"], ep["title"], _path(conn, s)))
+        else:
+            s = _series_row(conn, row["ref"])
+            parent = _series_row(conn, s["parent"])
+            hits.append(Hit("subseries", s["id"], s["lang"], s["title"], parent["title"]))
+    return hits
+
+
+def _series_row(conn, series_id):
+    return conn.execute("SELECT * FROM series WHERE id = ?", (series_id,)).fetchone()
+
+
+def _path(conn, s):
+    if s["parent"]:
+        return f"{_series_row(conn, s['parent'])['title']} / {s['title']}"
+    return s["title"]
+
+
+def _episodes(conn, series_id, episode_id=None):
+    sql = (
+        "SELECT title, slug, duration, file, description FROM episodes"
+        " WHERE series = ?"
+    )
+    args = [series_id]
+    if episode_id is not None:
+        sql += " AND id = ?"
+        args.append(episode_id)
+    sql += " ORDER BY position"
+    return [dict(r) for r in conn.execute(sql, args)]
+
+
+def _subseries(conn, s, episode_id=None):
+    return {
+        "title": s["title"],
+        "slug": s["slug"],
+        "episodes": _episodes(conn, s["id"], episode_id),
+    }
+
+
+def load_target(conn, hit):
+    """
+    (lang, entry) for a search hit, shaped like a structure cache entry so
+    the scheduler can plan it. Sub-series and episode hits produce an entry
+    holding just that part, so it lands in the same folder as a full
+    download of its series would.
+    """
+    if hit.kind == "series":
+        s = _series_row(conn, hit.id)
+        entry = {"title": s["title"], "slug": s["slug"]}
+        if s["kind"] == "container":
+            children = conn.execute(
+                "SELECT * FROM series WHERE parent = ? ORDER BY position", (s["id"],)
+            )
+            entry["subseries"] = [_subseries(conn, c) for c in children]
+        else:
+            entry["episodes"] = _episodes(conn, s["id"])
+        return s["lang"], entry
+
+    episode_id = None
+    if hit.kind == "episode":
+        episode_id = hit.id
+        series_id = conn.execute(
+            "SELECT series FROM episodes WHERE id = ?", (hit.id,)
+        ).fetchone()["series"]
+    else:
+        series_id = hit.id
+
+    s = _series_row(conn, series_id)
+    if s["parent"] is None:
+        entry = {
+            "title": s["title"],
+            "slug": s["slug"],
+            "episodes": _episodes(conn, s["id"], episode_id),
+        }
+    else:
+        parent = _series_row(conn, s["parent"])
+        entry = {
+            "title": parent["title"],
+            "slug": parent["slug"],
+            "subseries": [_subseries(conn, s, episode_id)],
+        }
+    return s["lang"], entry
@@ -0,0 +1,257 @@
+"""
+Compact binary form of a structure cache, read through mmap.
+
+structure_<lang>.json stays the source of truth. Next to it the builders
+(and the downloader, when it finds it missing or stale) write
+structure_<lang>.bin holding the same series in a layout that needs no
+parsing:
+
+  header    magic, version, record counts, section offsets and the stamp
+            (mtime, size) of the JSON it was made from
+  nodes     one fixed-width record per series, container and sub-series;
+            the top-level series come first, in cache order
+  episodes  one fixed-width record per episode, grouped by series
+  names     series and sub-series titles and slugs, UTF-8, referenced by
+            (offset, length), kept together so listing titles touches only
+            these pages
+  strings   episode titles, slugs, durations, files and descriptions, the
+            same way; repeated short strings (durations, shared files) are
+            stored once
+
+Opening one maps the file and reads the header. titles() decodes just the
+top-level titles; entry(i) decodes one series with its episodes when it is
+picked. Nothing else is read, so start-up time and memory don't grow with
+the catalog.
+"""
+
+import mmap
+import os
+import struct
+import tempfile
+from pathlib import Path
+
+MAGIC = b"OSHOCAT\0"
+VERSION = 1
+NONE = 0xFFFFFFFF  # string length marking a missing value
+CONTAINER = 1  # node flag: children are sub-series, not episodes
+DEDUPE_MAX = 256  # longer strings (descriptions) are not looked up for reuse
+
+# magic, version, top-level series, nodes, episodes, nodes / episodes /
+# names / strings offsets, source mtime_ns, source size
+HEADER = struct.Struct("<8sIIIIQQQQqQ")
+# title, slug (offset, length each), first child node or episode, count, flags
+NODE = struct.Struct("<7I")
+# title, slug, duration, file, description (offset, length each)
+EPISODE = struct.Struct("<10I")
+EPISODE_FIELDS = ("title", "slug", "duration", "file", "description")
+
+
+def _stamp(source):
+    st = os.stat(source)
+    return st.st_mtime_ns, st.st_size
+
+
+# -----------------------------
+# writing
+# -----------------------------
+def write_compact(path, series, source):
+    """
+    Write series (a structure cache's entries, any iterable, consumed once)
+    to path, recording the stamp of source, the JSON file it came from.
+    Written under a temp name and renamed into place.
+    """
+    def string_table():
+        table = bytearray()
+        seen = {}
+
+        def ref(text):
+            if text is None:
+                return 0, NONE
+            if text in seen:
+                return seen[text]
+            data = text.encode("utf-8")
+            found = (len(table), len(data))
+            table.extend(data)
+            if len(text) <= DEDUPE_MAX:
+                seen[text] = found
+            return found
+
+        return table, ref
+
+    names, name = string_table()
+    strings, ref = string_table()
+
+    top = bytearray()  # top-level nodes
+    subs = bytearray()  # sub-series nodes, stored after them
+    episodes = bytearray()
+    containers = []  # offsets in top of container nodes, fixed up below
+    n_top = n_subs = n_episodes = 0
+
+    def add(s, out):
+        nonlocal n_episodes
+        eps = s.get("episodes", [])
+        out.extend(NODE.pack(*name(s.get("title")), *name(s.get("slug")), n_episodes, len(eps), 0))
+        for ep in eps:
+            episodes.extend(EPISODE.pack(*(x for f in EPISODE_FIELDS for x in ref(ep.get(f)))))
+        n_episodes += len(eps)
+
+    for s in series:
+        if "subseries" in s:
+            containers.append(len(top))
+            top.extend(
+                NODE.pack(
+                    *name(s.get("title")),
+                    *name(s.get("slug")),
+                    n_subs,
+                    len(s["subseries"]),
+                    CONTAINER,
+                )
+            )
+            for ss in s["subseries"]:
+                add(ss, subs)
+                n_subs += 1
+        else:
+            add(s, top)
+        n_top += 1
+
+    # sub-series are numbered after all top-level nodes
+    for offset in containers:
+        rec = list(NODE.unpack_from(top, offset))
+        rec[4] += n_top
+        NODE.pack_into(top, offset, *rec)
+    nodes = top + subs
+
+    nodes_off = HEADER.size
+    episodes_off = nodes_off + len(nodes)
+    names_off = episodes_off + len(episodes)
+    strings_off = names_off + len(names)
+    header = HEADER.pack(
+        MAGIC,
+        VERSION,
+        n_top,
+        n_top + n_subs,
+        n_episodes,
+        nodes_off,
+        episodes_off,
+        names_off,
+        strings_off,
+        *_stamp(source),
+    )
+
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header)
+            f.write(nodes)
+            f.write(episodes)
+            f.write(names)
+            f.write(strings)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+# -----------------------------
+# reading
+# -----------------------------
+class CompactCatalog:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if hasattr(mmap, "MADV_RANDOM"):
+            # records are read a few at a time; readahead would only pull
+            # in neighbouring series nobody asked for
+            self._mm.madvise(mmap.MADV_RANDOM)
+        if len(self._mm) < HEADER.size:
+            raise ValueError(f"{path}: truncated")
+        (
+            magic,
+            version,
+            self.top,
+            self.nodes,
+            self.episodes,
+            self._nodes_off,
+            self._episodes_off,
+            self._names_off,
+            self._strings_off,
+            *self.stamp,
+        ) = HEADER.unpack_from(self._mm, 0)
+        self.stamp = tuple(self.stamp)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path}: not a version {VERSION} compact catalog")
+
+    def __len__(self):
+        return self.top
+
+    def _str(self, offset, length, base=None):
+        if length == NONE:
+            return None
+        start = (self._strings_off if base is None else base) + offset
+        return self._mm[start : start + length].decode("utf-8")
+
+    def _name(self, offset, length):
+        return self._str(offset, length, self._names_off)
+
+    def _node(self, i):
+        return NODE.unpack_from(self._mm, self._nodes_off + i * NODE.size)
+
+    def title(self, i):
+        return self._name(*self._node(i)[:2])
+
+    def titles(self):
+        return [self.title(i) for i in range(self.top)]
+
+    def _episodes(self, first, count):
+        eps = []
+        for k in range(first, first + count):
+            rec = EPISODE.unpack_from(self._mm, self._episodes_off + k * EPISODE.size)
+            eps.append({f: self._str(*rec[2 * j : 2 * j + 2]) for j, f in enumerate(EPISODE_FIELDS)})
+        return eps
+
+    def _series(self, i):
+        title_off, title_len, slug_off, slug_len, first, count, flags = self._node(i)
+        entry = {"title": self._name(title_off, title_len), "slug": self._name(slug_off, slug_len)}
+        if flags & CONTAINER:
+            entry["subseries"] = [self._series(j) for j in range(first, first + count)]
+        else:
+            entry["episodes"] = self._episodes(first, count)
+        return entry
+
+    def entry(self, i):
+        """
+        Series i in full, shaped like a structure cache entry.
+        """
+        if not 0 <= i < self.top:
+            raise IndexError(i)
+        return self._series(i)
+
+    def close(self):
+        self._mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_compact(path, source):
+    """
+    The CompactCatalog at path, or None if it is missing, unreadable or
+    wasn't made from the current source file.
+    """
+    try:
+        packed = CompactCatalog(path)
+    except (OSError, ValueError):
+        return None
+    try:
+        current = _stamp(source)
+    except OSError:
+        current = None
+    if packed.stamp != current:
+        packed.close()
+        return None
+    return packed
@@ -0,0 +1,74 @@
+"""
+Bounded, rate-limited fan-out for the structure cache crawlers.
+
+A crawl is split into stages (series, sub-series, episode pages, ...). Each
+stage gets its own thread pool, so a task may block on tasks of a deeper
+stage without starving the pool it runs in. A single Throttle shared by
+all stages caps the request rate against the site.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from oshodl import profiling
+
+CONCURRENCY = 8
+RPS = 20.0
+
+
+class Throttle:
+    """
+    Spaces request starts at least 1/rps seconds apart across all threads.
+    rps <= 0 disables throttling.
+    """
+
+    def __init__(self, rps=RPS):
+        self.interval = 1.0 / rps if rps > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            with profiling.stage("sleep"):
+                time.sleep(slot - now)
+
+
+class CrawlPool:
+    def __init__(self, concurrency=CONCURRENCY, rps=RPS):
+        self.concurrency = concurrency
+        self.throttle = Throttle(rps)
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def _executor(self, stage):
+        with self._lock:
+            if stage not in self._stages:
+                self._stages[stage] = ThreadPoolExecutor(
+                    max_workers=self.concurrency, thread_name_prefix=f"crawl-{stage}"
+                )
+            return self._stages[stage]
+
+    def map(self, stage, fn, items):
+        """
+        Run fn over items on the stage's pool and return the results in
+        input order. The first exception is re-raised.
+        """
+        items = list(items)
+        if not items:
+            return []
+        executor = self._executor(stage)
+        futures = [executor.submit(fn, item) for item in items]
+        return [f.result() for f in futures]
+
+    def close(self):
+        with self._lock:
+            for executor in self._stages.values():
+                executor.shutdown(wait=False, cancel_futures=True)
+            self._stages.clear()
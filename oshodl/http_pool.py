@@ -0,0 +1,175 @@
+"""
+Pooled keep-alive HTTP session shared by the downloader and the cache tools.
+
+Every request goes through one requests.Session with a sized connection
+pool, so repeated calls to oshoworld.com reuse open TLS connections instead
+of paying a new handshake each time. Connection and request counters show
+how much reuse actually happened, and every request's latency is recorded
+per endpoint in oshodl.metrics.
+"""
+
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from oshodl import metrics, profiling
+
+POOL_SIZE = 16
+TIMEOUT = 30
+DEFAULT_HEADERS = {"User-Agent": "Mozilla/5.0", "Connection": "keep-alive"}
+
+REQUESTS = metrics.counter(
+    "oshodl_http_requests_total", "HTTP requests by endpoint and status", ["endpoint", "status"]
+)
+LATENCY = metrics.histogram(
+    "oshodl_http_request_seconds",
+    "Time to response headers (whole body unless streamed) by endpoint",
+    ["endpoint"],
+)
+
+
+def endpoint_of(url):
+    """
+    Low-cardinality label for a URL: the API name (series-filter, …),
+    _next/data, file (audio) or page.
+    """
+    path = urlsplit(url).path
+    m = re.match(r"/api/server/audio/([\w-]+)", path)
+    if m:
+        return m.group(1)
+    if path.startswith("/_next/data/"):
+        return "_next/data"
+    if path.lower().endswith(".mp3"):
+        return "file"
+    return "page"
+
+
+class PoolStats:
+    def __init__(self):
+        self.requests = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+
+    def add_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def add_connection(self):
+        with self._lock:
+            self.connections += 1
+
+    def summary(self) -> str:
+        reused = max(self.requests - self.connections, 0)
+        return (
+            f"{self.requests} requests over {self.connections} connections "
+            f"({reused} reused)"
+        )
+
+
+def _counting_pool(base, stats):
+    class CountingPool(base):
+        def _new_conn(self):
+            stats.add_connection()
+            return super()._new_conn()
+
+    return CountingPool
+
+
+class CountingAdapter(HTTPAdapter):
+    """
+    HTTPAdapter whose connection pools count every new connection they open.
+    """
+
+    def __init__(self, stats, **kwargs):
+        self.stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _counting_pool(HTTPConnectionPool, self.stats),
+            "https": _counting_pool(HTTPSConnectionPool, self.stats),
+        }
+
+
+class HttpPool:
+    """
+    Thread-safe wrapper around one requests.Session.
+
+    The session is shared by all worker threads; urllib3's pool hands each
+    thread its own connection, and nothing here relies on session cookies.
+    Per-call headers are merged over the defaults and a default timeout is
+    applied unless the caller passes one.
+    """
+
+    def __init__(self, pool_size=POOL_SIZE, timeout=TIMEOUT, headers=None):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.stats = PoolStats()
+
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS)
+        self.session.headers.update(headers or {})
+
+        adapter = CountingAdapter(
+            self.stats, pool_connections=pool_size, pool_maxsize=pool_size
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        self.stats.add_request()
+        endpoint = endpoint_of(url)
+        start = time.perf_counter()
+        try:
+            with profiling.stage("http"):
+                r = self.session.request(method, url, **kwargs)
+        except requests.exceptions.RequestException as e:
+            REQUESTS.inc(endpoint=endpoint, status=type(e).__name__)
+            raise
+        finally:
+            LATENCY.observe(time.perf_counter() - start, endpoint=endpoint)
+        REQUESTS.inc(endpoint=endpoint, status=r.status_code)
+        return r
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def head(self, url, **kwargs):
+        return self.request("HEAD", url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def configure(pool_size=POOL_SIZE, timeout=TIMEOUT, headers=None):
+    """
+    Replace the process-wide pool. Call before the first request.
+    """
+    global _shared
+    with _shared_lock:
+        if _shared is not None:
+            _shared.close()
+        _shared = HttpPool(pool_size=pool_size, timeout=timeout, headers=headers)
+        return _shared
+
+
+def get_pool():
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = HttpPool()
+        return _shared
@@ -0,0 +1,125 @@
+"""
+Reading a large JSON array one element at a time.
+
+The structure caches are a top-level array of series (Hindi) or an object
+whose "series" member is that array (English). iter_array() reads the file
+in blocks and hands each element to json's own decoder (raw_decode) as soon
+as it is complete, so only one series is ever held in memory, however big
+the cache grows.
+"""
+
+import json
+
+BLOCK = 1024 * 1024  # characters read at a time
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = json.decoder.WHITESPACE
+
+
+class _Reader:
+    """
+    A text buffer over f that is extended on demand and compacted as the
+    parser moves forward.
+    """
+
+    def __init__(self, f, block):
+        self.f = f
+        self.block = block
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def more(self, need=None):
+        """
+        Append another block (or at least need characters); False at EOF.
+        """
+        if self.eof:
+            return False
+        if self.pos > len(self.buf) // 2:
+            self.buf = self.buf[self.pos :]
+            self.pos = 0
+        data = self.f.read(max(self.block, need or 0))
+        if not data:
+            self.eof = True
+            return False
+        self.buf += data
+        return True
+
+    def peek(self):
+        """
+        The next non-whitespace character ("" at EOF), without consuming it.
+        """
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.more():
+                return ""
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"expected {char!r} at offset {self.pos} of the buffer")
+        self.pos += 1
+
+    def value(self):
+        """
+        Decode the JSON value starting at the next non-whitespace character.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # most likely cut off at the end of the buffer: read on,
+                # doubling so a huge value isn't re-parsed block by block
+                if not self.more(len(self.buf) - self.pos):
+                    raise
+                continue
+            if end == len(self.buf) and not self.eof:
+                # a number may continue in the next block
+                if self.more():
+                    continue
+            self.pos = end
+            return value
+
+
+def _items(r):
+    r.expect("[")
+    if r.peek() == "]":
+        r.pos += 1
+        return
+    while True:
+        yield r.value()
+        sep = r.peek()
+        r.pos += 1
+        if sep == "]":
+            return
+        if sep != ",":
+            raise ValueError(f"expected ',' or ']' in array, got {sep!r}")
+
+
+def iter_array(f, key=None, block=BLOCK):
+    """
+    Yield the elements of the top-level array in text file f, or, when the
+    top level is an object, of the array under key. Other members of that
+    object are skipped.
+    """
+    r = _Reader(f, block)
+    first = r.peek()
+    if first == "[":
+        yield from _items(r)
+        return
+    if first != "{" or key is None:
+        raise ValueError("Unknown structure format")
+
+    r.expect("{")
+    while r.peek() != "}":
+        name = r.value()
+        r.expect(":")
+        if name == key and r.peek() == "[":
+            yield from _items(r)
+            return
+        r.value()
+        if r.peek() == ",":
+            r.pos += 1
+    raise ValueError(f"no {key!r} array in object")
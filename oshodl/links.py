@@ -0,0 +1,87 @@
+"""
+Placing one downloaded file in several folders.
+
+The same audio file is often listed under more than one series (a Hindi
+container and the standalone series it collects, compilations). The
+scheduler downloads it once and puts the other copies in place with
+link_file(), in one of these modes:
+
+  hardlink  same inode, no extra disk space (same filesystem only)
+  reflink   copy-on-write clone (Btrfs, XFS, …), independent files
+  symlink   relative symbolic link to the downloaded copy
+  copy      plain copy: saves bandwidth, not disk
+
+A mode the filesystem can't do falls back to a copy.
+"""
+
+import errno
+import os
+import shutil
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+LINK_MODES = ("hardlink", "reflink", "symlink", "copy")
+FICLONE = 0x40049409  # linux/fs.h: _IOW(0x94, 9, int)
+
+# errors meaning "this filesystem / pair of paths can't do that", as opposed
+# to real failures such as a full disk
+UNSUPPORTED = {errno.EXDEV, errno.EPERM, errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.EMLINK}
+
+
+def _reflink(src, dst):
+    if fcntl is None:
+        raise OSError(errno.EOPNOTSUPP, "reflinks are not supported here")
+    with open(src, "rb") as s, open(dst, "wb") as d:
+        fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+
+
+def _copy(src, dst):
+    shutil.copyfile(src, dst)
+
+
+def link_file(src, dst, mode="hardlink"):
+    """
+    Make dst a copy of src using mode. Returns the mode actually used
+    ("copy" after a fallback), or None if dst already exists.
+    """
+    src, dst = Path(src), Path(dst)
+    if dst.exists():
+        return None
+    dst.parent.mkdir(parents=True, exist_ok=True)
+
+    if mode == "symlink":
+        try:
+            dst.symlink_to(os.path.relpath(src, dst.parent))
+            return mode
+        except OSError as e:
+            # e.g. Windows without the symlink privilege
+            if e.errno not in UNSUPPORTED and getattr(e, "winerror", None) is None:
+                raise
+            mode = "copy"
+
+    # build under a temporary name so dst never exists half-written
+    tmp = dst.with_name(dst.name + ".part")
+    tmp.unlink(missing_ok=True)
+    try:
+        try:
+            if mode == "hardlink":
+                os.link(src, tmp)
+            elif mode == "reflink":
+                _reflink(src, tmp)
+            else:
+                _copy(src, tmp)
+        except OSError as e:
+            if mode == "copy" or e.errno not in UNSUPPORTED:
+                raise
+            tmp.unlink(missing_ok=True)
+            _copy(src, tmp)
+            mode = "copy"
+        os.replace(tmp, dst)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return mode
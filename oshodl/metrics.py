@@ -0,0 +1,285 @@
+"""
+Counters, gauges and histograms for long-running jobs.
+
+Metrics live in one process-wide registry and can be exported three ways,
+chosen on the command line (see add_arguments):
+
+  --metrics-port  serve Prometheus text format on http://<addr>:<port>/metrics
+  --metrics-file  rewrite a Prometheus text file every METRICS_INTERVAL
+                  seconds (for node_exporter's textfile collector)
+  --metrics-json  write a JSON summary of every metric when the job exits
+
+Nothing is exported unless one of them is given; recording is always on
+and costs one lock per update.
+"""
+
+import atexit
+import bisect
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+METRICS_INTERVAL = 15.0  # seconds between --metrics-file rewrites
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def samples(self):
+        with self._lock:
+            return list(self.values.items())
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in self.samples():
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {value}")
+        return lines
+
+    def summary(self):
+        return [
+            {"labels": dict(zip(self.labelnames, key)), "value": value}
+            for key, value in self.samples()
+        ]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """
+    Set explicitly, or read from fn() whenever the metric is exported.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name, help, labelnames=(), fn=None):
+        super().__init__(name, help, labelnames)
+        self.fn = fn
+
+    def set(self, value, **labels):
+        with self._lock:
+            self.values[self._key(labels)] = value
+
+    def samples(self):
+        if self.fn is not None:
+            return [((), self.fn())]
+        return super().samples()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self.values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[i] += 1
+            self.values[key] = (counts, total + value)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total) in self.samples():
+            running = 0
+            for bound, n in zip(self.buckets + ("+Inf",), counts):
+                running += n
+                le = _labels(self.labelnames, key, [("le", bound)])
+                lines.append(f"{self.name}_bucket{le} {running}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {running}")
+        return lines
+
+    def summary(self):
+        out = []
+        for key, (counts, total) in self.samples():
+            n = sum(counts)
+            out.append(
+                {
+                    "labels": dict(zip(self.labelnames, key)),
+                    "count": n,
+                    "sum": round(total, 6),
+                    "mean": round(total / n, 6) if n else None,
+                    "buckets": dict(zip(map(str, self.buckets + ("+Inf",)), counts)),
+                }
+            )
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._get(Counter, name, help, labelnames)
+
+    def gauge(self, name, help, labelnames=(), fn=None):
+        gauge = self._get(Gauge, name, help, labelnames)
+        if fn is not None:
+            # the latest owner (e.g. a new scheduler) reports the value
+            gauge.fn = fn
+        return gauge
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._get(Histogram, name, help, labelnames, buckets)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        with self._lock:
+            metrics = list(self.metrics.values())
+        return {m.name: m.summary() for m in metrics}
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+
+
+# -----------------------------
+# exporters
+# -----------------------------
+class _Handler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+def serve(port, addr="127.0.0.1", registry=REGISTRY):
+    handler = type("MetricsHandler", (_Handler,), {"registry": registry})
+    server = ThreadingHTTPServer((addr, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
+
+
+def _write_atomic(path, text):
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def write_textfile(path, registry=REGISTRY):
+    _write_atomic(path, registry.render())
+
+
+def write_summary(path, job, started, registry=REGISTRY):
+    data = {
+        "job": job,
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(started)),
+        "seconds": round(time.time() - started, 3),
+        "metrics": registry.summary(),
+    }
+    _write_atomic(path, json.dumps(data, indent=2) + "\n")
+
+
+def add_arguments(parser):
+    group = parser.add_argument_group("metrics")
+    group.add_argument(
+        "--metrics-port", type=int, help="serve Prometheus metrics on this port"
+    )
+    group.add_argument(
+        "--metrics-addr", default="127.0.0.1", help="address for --metrics-port"
+    )
+    group.add_argument(
+        "--metrics-file",
+        metavar="PATH",
+        help=f"write Prometheus metrics to PATH every {METRICS_INTERVAL:.0f}s",
+    )
+    group.add_argument(
+        "--metrics-json", metavar="PATH", help="write a JSON summary to PATH at exit"
+    )
+
+
+def start(args, job):
+    """
+    Start whatever exporters args asked for; the file and JSON outputs are
+    also written once more when the process exits.
+    """
+    started = time.time()
+    if args.metrics_port:
+        serve(args.metrics_port, args.metrics_addr)
+        print(f"[i] Metrics on http://{args.metrics_addr}:{args.metrics_port}/metrics")
+
+    if args.metrics_file:
+        stop = threading.Event()
+
+        def loop():
+            while not stop.wait(METRICS_INTERVAL):
+                write_textfile(args.metrics_file)
+
+        threading.Thread(target=loop, name="metrics-file", daemon=True).start()
+        atexit.register(write_textfile, args.metrics_file)
+        atexit.register(stop.set)
+
+    if args.metrics_json:
+        atexit.register(write_summary, args.metrics_json, job, started)
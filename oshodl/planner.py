@@ -0,0 +1,140 @@
+"""
+Sizing a download before it starts.
+
+The scheduler describes every queued episode as a PlanItem: its size and
+how much of it still has to be fetched and stored, after subtracting what
+is already on disk. Sizes come from the state store when known, otherwise
+from HEAD requests sent in parallel (remembered for the next run), and as a
+last resort from the episode's duration.
+
+A Plan adds them up, estimates the time at the throughput measured on the
+last run and checks the free space of the download directory. A plan that
+doesn't fit can be trimmed to the episodes that do, in queue order.
+"""
+
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+from oshodl.http_pool import get_pool
+from oshodl.progress import human_rate, human_size, human_time
+
+PLAN_WORKERS = 8  # parallel HEAD requests
+DISK_RESERVE = 256 * 1024**2  # free space a plan must leave untouched
+
+
+def head_size(url):
+    r = get_pool().head(url, allow_redirects=True)
+    r.raise_for_status()
+    return int(r.headers.get("Content-Length", 0)) or None
+
+
+def fetch_sizes(urls, workers=PLAN_WORKERS):
+    """
+    {key: size} for {key: url}, from HEAD requests sent workers at a time.
+    Keys whose request fails or has no Content-Length are left out.
+    """
+
+    def one(item):
+        key, url = item
+        try:
+            return key, head_size(url)
+        except requests.RequestException:
+            return key, None
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        return {key: size for key, size in executor.map(one, urls.items()) if size}
+
+
+def disk_free(path):
+    """
+    Free bytes on the filesystem that path is (or will be) created on.
+    """
+    path = Path(path).resolve()
+    while not path.exists():
+        path = path.parent
+    return shutil.disk_usage(path).free
+
+
+class PlanItem:
+    """
+    One queued episode: size (None if unknown), where the size came from
+    ("known", "head", "estimate" or "unknown"), bytes still to fetch and
+    extra disk space it will take.
+    """
+
+    __slots__ = ("job", "size", "source", "fetch", "disk")
+
+    def __init__(self, job, size, source, fetch, disk):
+        self.job = job
+        self.size = size
+        self.source = source
+        self.fetch = fetch
+        self.disk = disk
+
+
+class Plan:
+    def __init__(self, items, free, rate=None):
+        self.items = items
+        self.free = free
+        self.rate = rate  # bytes/s measured on the last run, if any
+
+    @property
+    def fetch(self):
+        return sum(i.fetch for i in self.items)
+
+    @property
+    def disk(self):
+        return sum(i.disk for i in self.items)
+
+    @property
+    def available(self):
+        return max(self.free - DISK_RESERVE, 0)
+
+    def fits(self):
+        return self.disk <= self.available
+
+    def trim(self):
+        """
+        The leading items whose disk space fits.
+        """
+        kept, used = [], 0
+        for item in self.items:
+            if used + item.disk > self.available:
+                break
+            used += item.disk
+            kept.append(item)
+        return kept
+
+    def summary(self):
+        total = sum(i.size or 0 for i in self.items)
+        lines = [
+            f"[*] Plan: {len(self.items)} episodes, {human_size(self.fetch)} to download"
+            f" ({human_size(max(total - self.fetch, 0))} already on disk)"
+        ]
+        sources = {}
+        for i in self.items:
+            sources[i.source] = sources.get(i.source, 0) + 1
+        labels = {
+            "known": "known",
+            "head": "from HEAD",
+            "estimate": "estimated from duration",
+            "unknown": "unknown",
+        }
+        lines.append(
+            "    sizes: "
+            + ", ".join(f"{sources[k]} {v}" for k, v in labels.items() if sources.get(k))
+        )
+        if self.fetch and self.rate:
+            lines.append(
+                f"[*] Estimated time: {human_time(self.fetch / self.rate)} "
+                f"at {human_rate(self.rate)} (last run)"
+            )
+        elif self.fetch:
+            lines.append("[*] Estimated time: unknown until a run has been measured")
+        lines.append(
+            f"[*] Disk: {human_size(self.disk)} needed, {human_size(self.free)} free"
+        )
+        return lines
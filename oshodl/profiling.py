@@ -0,0 +1,197 @@
+"""
+Opt-in profiling of the crawler and downloader hot paths.
+
+Code marks its stages with `with profiling.stage("http"):`. While
+profiling is on, each stage adds up its calls, wall time and the calling
+thread's CPU time; while it is off, stage() returns a shared no-op context
+and costs next to nothing. The stages used are:
+
+  http       waiting for a response (headers, or the whole body if not streamed)
+  http.read  waiting for the next chunk of a streamed download
+  json       decoding / encoding JSON
+  disk       writing episode data, cache files and journals
+  hash       SHA-256 of downloaded data
+  sqlite     download state updates
+  sleep      deliberate waits: request throttle, retry backoff, bandwidth cap
+
+Optionally cProfile runs in every thread and tracemalloc records
+allocations. The report is written when the process exits.
+"""
+
+import atexit
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import nullcontext
+from pathlib import Path
+
+TOP = 30  # rows of cProfile / tracemalloc output in the report
+
+ENABLED = False
+_NOOP = nullcontext()
+_totals = {}  # stage -> [calls, wall, cpu]
+_lock = threading.Lock()
+_profiles = []
+_started = None
+
+
+class _Stage:
+    __slots__ = ("name", "wall", "cpu")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.wall = time.perf_counter()
+        self.cpu = time.thread_time()
+
+    def __exit__(self, *exc):
+        add(self.name, time.perf_counter() - self.wall, time.thread_time() - self.cpu)
+
+
+def stage(name):
+    return _Stage(name) if ENABLED else _NOOP
+
+
+def add(name, wall, cpu=0.0, calls=1):
+    with _lock:
+        t = _totals.setdefault(name, [0, 0.0, 0.0])
+        t[0] += calls
+        t[1] += wall
+        t[2] += cpu
+
+
+def timed_iter(iterable, name):
+    """
+    Yield from iterable, counting the time spent waiting for each item as
+    stage name.
+    """
+    if not ENABLED:
+        yield from iterable
+        return
+    it = iter(iterable)
+    while True:
+        with _Stage(name):
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+        yield item
+
+
+# -----------------------------
+# cProfile in every thread
+# -----------------------------
+def _start_thread_profile(*_):
+    # runs once, as the profile hook of a freshly started thread, and
+    # replaces itself with a real profiler for that thread
+    prof = cProfile.Profile()
+    with _lock:
+        _profiles.append(prof)
+    sys.setprofile(None)
+    prof.enable()
+
+
+def enable(cprofile=False, memory=False):
+    global ENABLED, _started
+    ENABLED = True
+    _started = (time.perf_counter(), time.process_time())
+    if cprofile:
+        threading.setprofile(_start_thread_profile)
+        prof = cProfile.Profile()
+        _profiles.append(prof)
+        prof.enable()
+    if memory:
+        tracemalloc.start(10)
+
+
+# -----------------------------
+# report
+# -----------------------------
+def stage_table():
+    with _lock:
+        rows = sorted(_totals.items(), key=lambda kv: -kv[1][1])
+    lines = [f"{'stage':12} {'calls':>9} {'wall s':>10} {'cpu s':>10} {'cpu %':>6}"]
+    for name, (calls, wall, cpu) in rows:
+        pct = f"{cpu * 100 / wall:5.0f}%" if wall else "     -"
+        lines.append(f"{name:12} {calls:9} {wall:10.3f} {cpu:10.3f} {pct}")
+    return lines
+
+
+def report(job):
+    """
+    (report text, combined pstats.Stats or None).
+    """
+    wall = time.perf_counter() - _started[0]
+    cpu = time.process_time() - _started[1]
+    lines = [
+        f"Profile of {job}",
+        f"elapsed {wall:.3f}s, process CPU {cpu:.3f}s ({cpu * 100 / wall:.0f}% of one core)",
+        "",
+        "Stage totals (wall is summed over threads, so it can exceed elapsed):",
+        *stage_table(),
+    ]
+
+    # snapshot first, so building the cProfile report doesn't show up in it
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        lines += [
+            "",
+            f"tracemalloc: current {current / 1048576:.1f} MB, peak {peak / 1048576:.1f} MB",
+            f"top {TOP} allocation sites:",
+        ]
+        lines += [str(s) for s in snapshot.statistics("lineno")[:TOP]]
+
+    stats = None
+    if _profiles:
+        for prof in _profiles:
+            prof.disable()
+            stats = pstats.Stats(prof) if stats is None else stats.add(prof)
+        buf = io.StringIO()
+        stats.stream = buf
+        stats.sort_stats("cumulative").print_stats(TOP)
+        lines += ["", f"cProfile, all threads, top {TOP} by cumulative time:", buf.getvalue()]
+    return "\n".join(lines) + "\n", stats
+
+
+def add_arguments(parser):
+    group = parser.add_argument_group("profiling")
+    group.add_argument(
+        "--profile",
+        action="store_true",
+        help="time each stage (HTTP, JSON, disk, sleep …) and write a report at exit",
+    )
+    group.add_argument("--profile-out", metavar="PATH", help="report file (default <job>.profile.txt)")
+    group.add_argument(
+        "--profile-cprofile",
+        action="store_true",
+        help="also run cProfile in every thread (implies --profile, slower)",
+    )
+    group.add_argument(
+        "--profile-memory",
+        action="store_true",
+        help="also trace allocations with tracemalloc (implies --profile, slower)",
+    )
+
+
+def start(args, job):
+    if not (args.profile or args.profile_cprofile or args.profile_memory):
+        return
+    enable(cprofile=args.profile_cprofile, memory=args.profile_memory)
+    out = Path(args.profile_out or f"{job}.profile.txt")
+
+    def finish():
+        text, stats = report(job)
+        out.write_text(text, encoding="utf-8")
+        if stats is not None:
+            stats.dump_stats(out.with_suffix(".pstats"))
+        print("\n".join(stage_table()))
+        print(f"[i] Profile written to {out}")
+
+    atexit.register(finish)
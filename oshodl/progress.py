@@ -0,0 +1,291 @@
+"""
+Central progress display for the download scheduler.
+
+Each running episode gets an EpisodeProgress that only its own worker
+writes to (plain attribute updates, no lock on the per-chunk path). One
+renderer thread reads them every INTERVAL seconds and draws per-episode,
+per-series and overall progress. Throughput is an exponential moving
+average; the ETA is the remaining bytes divided by it. Sizes come from
+Content-Length once an episode starts, and from its duration before that.
+
+Everything else the downloader prints goes through ProgressBoard.log(),
+which clears the status block, prints the line and redraws the block, so
+output from several workers never interleaves.
+"""
+
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+
+INTERVAL = 0.5  # seconds between redraws
+LOG_INTERVAL = 10.0  # seconds between status lines when not on a terminal
+SMOOTHING = 0.3  # weight of the newest sample in the throughput averages
+BITRATE = 128_000  # bits/s assumed when estimating a size from a duration
+
+
+def human_time(seconds: float) -> str:
+    if seconds <= 0:
+        return "∞"
+    m, s = divmod(int(seconds), 60)
+    h, m = divmod(m, 60)
+    if h:
+        return f"{h}h {m}m"
+    if m:
+        return f"{m}m {s}s"
+    return f"{s}s"
+
+
+def human_size(num: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if num < 1024 or unit == "GB":
+            return f"{num:.0f} {unit}" if unit == "B" else f"{num:.1f} {unit}"
+        num /= 1024
+
+
+def human_rate(bps: float) -> str:
+    return f"{human_size(bps)}/s"
+
+
+def estimate_size(ep):
+    """
+    Rough size in bytes from an episode's "mm:ss" / "hh:mm:ss" duration, or
+    None if it has none.
+    """
+    m = re.fullmatch(r"(?:(\d+):)?(\d+):(\d{2})", (ep.get("duration") or "").strip())
+    if not m:
+        return None
+    seconds = int(m.group(1) or 0) * 3600 + int(m.group(2)) * 60 + int(m.group(3))
+    return seconds * BITRATE // 8 or None
+
+
+def _ema(old, sample):
+    return sample if old is None else SMOOTHING * sample + (1 - SMOOTHING) * old
+
+
+class EpisodeProgress:
+    """
+    Written only by the worker downloading the episode; read by the
+    renderer.
+    """
+
+    def __init__(self, series, name, estimate):
+        self.series = series
+        self.name = name
+        self.expected = estimate  # best guess until set_size()
+        self.bytes = 0  # on disk, including a resumed prefix
+        self.transferred = 0  # fetched during this run
+        self.rate = None
+        self._seen = 0
+
+    def resume(self, offset):
+        self.bytes = offset
+
+    def set_size(self, size):
+        if size:
+            self.series.correct(self.expected, size)
+            self.expected = size
+
+    def advance(self, n):
+        self.bytes += n
+        self.transferred += n
+
+    def set_bytes(self, n):
+        """
+        For downloads written by several threads at once (segments): one
+        poller reports the combined total instead of each writer advancing.
+        """
+        self.transferred += max(n - self.bytes, 0)
+        self.bytes = n
+
+    def percent(self):
+        return min(self.bytes * 100 // self.expected, 100) if self.expected else None
+
+
+class SeriesTotals:
+    def __init__(self, title, estimates):
+        self.title = title
+        self.total_eps = len(estimates)
+        self.finished = 0
+        self.done_bytes = 0  # size of finished episodes
+        self.active = []
+        self.rate = None
+        known = [e for e in estimates if e]
+        average = sum(known) // len(known) if known else 0
+        self.expected = sum(e or average for e in estimates)
+        self._lock = threading.Lock()
+
+    def correct(self, old, new):
+        with self._lock:
+            self.expected += new - (old or 0)
+
+    def remaining(self):
+        active = list(self.active)
+        have = self.done_bytes + sum(t.bytes for t in active)
+        return max(self.expected - have, 0)
+
+
+class ProgressBoard:
+    def __init__(self, stream=None, interval=INTERVAL):
+        self.stream = stream or sys.stdout
+        self.interval = interval
+        self.tty = self.stream.isatty()
+        if self.tty and os.name == "nt":
+            os.system("")  # turns on ANSI escape handling in the Windows console
+
+        self.series = []
+        self.total_eps = 0
+        self.finished = 0
+        self.transferred = 0  # bytes fetched by finished episodes
+        self.rate = None
+        self._lock = threading.Lock()  # guards output and the lists above
+        self._drawn = 0  # status lines currently on screen
+        self._last_total = 0
+        self._last_tick = None
+        self._last_log = 0.0
+        self._start = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    # -------------------- bookkeeping --------------------
+
+    def add_series(self, title, episodes):
+        totals = SeriesTotals(title, [estimate_size(ep) for ep in episodes])
+        with self._lock:
+            self.series.append(totals)
+            self.total_eps += totals.total_eps
+        return totals
+
+    def start_episode(self, series, name, ep):
+        task = EpisodeProgress(series, name, estimate_size(ep))
+        with self._lock:
+            series.active.append(task)
+        return task
+
+    def finish_episode(self, task, ok=True):
+        with self._lock:
+            series = task.series
+            series.active.remove(task)
+            self.transferred += task.transferred
+            if ok:
+                series.finished += 1
+                series.done_bytes += task.bytes
+                self.finished += 1
+            else:
+                # won't arrive this run; stop counting it as remaining
+                series.correct(task.expected, 0)
+
+    # -------------------- output --------------------
+
+    def log(self, msg):
+        with self._lock:
+            self._clear()
+            self.stream.write(f"{msg}\n")
+            self._draw(self._lines())
+            self.stream.flush()
+
+    def start(self):
+        self._start = self._last_tick = self._last_log = time.monotonic()
+        self._thread = threading.Thread(target=self._loop, name="progress", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        with self._lock:
+            self._clear()
+            elapsed = time.monotonic() - self._start if self._start else 0
+            total = self.transferred
+            rate = total / elapsed if elapsed > 0 else 0
+            self.stream.write(
+                f"[✓] {self.finished}/{self.total_eps} episodes, {human_size(total)} "
+                f"in {human_time(elapsed)} ({human_rate(rate)})\n"
+            )
+            self.stream.flush()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                self._tick()
+                if self.tty:
+                    self._clear()
+                    self._draw(self._lines())
+                elif time.monotonic() - self._last_log >= LOG_INTERVAL:
+                    self._last_log = time.monotonic()
+                    self.stream.write(self._summary() + "\n")
+                self.stream.flush()
+
+    def _tick(self):
+        """
+        Update every throughput average from the bytes moved since the last
+        tick.
+        """
+        now = time.monotonic()
+        dt = now - self._last_tick
+        self._last_tick = now
+        if dt <= 0:
+            return
+        total = self.transferred
+        for series in self.series:
+            series_rate = 0.0
+            for task in list(series.active):
+                seen = task.transferred
+                task.rate = _ema(task.rate, (seen - task._seen) / dt)
+                task._seen = seen
+                total += seen
+                series_rate += task.rate
+            series.rate = series_rate if series.active else None
+        self.rate = _ema(self.rate, max(total - self._last_total, 0) / dt)
+        self._last_total = total
+
+    def _eta(self, remaining, rate):
+        return human_time(remaining / rate) if rate else "∞"
+
+    def _summary(self):
+        remaining = sum(s.remaining() for s in self.series)
+        expected = sum(s.expected for s in self.series)
+        return (
+            f"[=] {self.finished}/{self.total_eps} episodes  "
+            f"{human_size(max(expected - remaining, 0))} / ~{human_size(expected)}  "
+            f"{human_rate(self.rate or 0)}  ETA {self._eta(remaining, self.rate)}"
+        )
+
+    def _lines(self):
+        if not self.tty or self._start is None:
+            return []
+        width, height = shutil.get_terminal_size()
+        lines = []
+        for series in self.series:
+            if not series.active:
+                continue
+            done = series.expected - series.remaining()
+            pct = done * 100 // series.expected if series.expected else 0
+            lines.append(
+                f"  [>] {series.title}  {series.finished}/{series.total_eps} eps  "
+                f"{pct}%  {human_rate(series.rate or 0)}  "
+                f"ETA {self._eta(series.remaining(), series.rate)}"
+            )
+            for task in series.active:
+                pct = task.percent()
+                pct = f"{pct:3}%" if pct is not None else human_size(task.bytes)
+                lines.append(
+                    f"      {task.name[:50]:50} {pct}  {human_rate(task.rate or 0)}"
+                )
+        lines.append(self._summary())
+        # never scroll: the block must fit to be cleared again
+        lines = lines[-max(height - 2, 1) :]
+        return [line[: width - 1] for line in lines]
+
+    def _clear(self):
+        if self._drawn:
+            # to the start of the first status line, then clear to the end
+            self.stream.write(f"\x1b[{self._drawn}F\x1b[J")
+            self._drawn = 0
+
+    def _draw(self, lines):
+        for line in lines:
+            self.stream.write(line + "\n")
+        self._drawn = len(lines)
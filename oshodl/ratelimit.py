@@ -0,0 +1,174 @@
+"""
+Global bandwidth cap shared by every download worker.
+
+A token bucket refilled at the configured bytes per second. Workers pay for
+each chunk after reading it; a worker that overdraws the bucket sleeps off
+its debt, which in turn stops it reading from the socket, so the total
+stays at the cap. Large chunks are paid for in slices, each taking its turn
+at the bucket, so no single episode can hog the budget.
+
+The cap is given as a rate ("2M", "500K", "0" = unlimited) or a time-of-day
+schedule ("08:00-18:00=2M,22:00-06:00=0,*=5M"). It can also be read from a
+file, which is re-read whenever it changes, to adjust a running download.
+"""
+
+import re
+import threading
+import time
+from pathlib import Path
+
+from oshodl import profiling
+
+SLICE = 64 * 1024  # bytes paid for per turn at the bucket
+BURST = 0.25  # seconds worth of tokens the bucket holds
+CHECK_INTERVAL = 1.0  # seconds between schedule / limit file checks
+
+UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3}
+UNLIMITED = {"0", "off", "none", "unlimited"}
+
+
+def parse_rate(text):
+    """
+    Bytes per second for "2M", "500K", "1.5MB/s", "300000"; 0 means no cap.
+    """
+    text = text.strip()
+    if text.lower() in UNLIMITED:
+        return 0
+    m = re.fullmatch(r"(\d+(?:\.\d+)?)\s*([KMG]?)(?:i?B)?(?:/s)?", text, re.I)
+    if not m:
+        raise ValueError(f"invalid rate: {text!r}")
+    return int(float(m.group(1)) * UNITS[m.group(2).upper()])
+
+
+def _minutes(hhmm):
+    m = re.fullmatch(r"(\d{1,2}):(\d{2})", hhmm.strip())
+    if not m or int(m.group(1)) > 24 or int(m.group(2)) > 59:
+        raise ValueError(f"invalid time: {hhmm!r}")
+    return int(m.group(1)) * 60 + int(m.group(2))
+
+
+class Schedule:
+    """
+    Rules of the form "HH:MM-HH:MM=RATE" (a window may wrap past midnight)
+    and "*=RATE" for all other times, separated by commas or newlines. The
+    first matching window wins. A bare rate is the same as "*=RATE".
+    """
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.windows = []
+        self.default = 0
+        for rule in re.split(r"[,\n]", spec):
+            rule = rule.split("#", 1)[0].strip()
+            if not rule:
+                continue
+            if "=" not in rule:
+                self.default = parse_rate(rule)
+                continue
+            when, rate = rule.split("=", 1)
+            when = when.strip()
+            if when == "*":
+                self.default = parse_rate(rate)
+                continue
+            if "-" not in when:
+                raise ValueError(f"invalid window: {when!r}")
+            start, end = when.split("-", 1)
+            self.windows.append((_minutes(start), _minutes(end), parse_rate(rate)))
+
+    def rate_at(self, t=None):
+        lt = time.localtime(t)
+        now = lt.tm_hour * 60 + lt.tm_min
+        for start, end, rate in self.windows:
+            if start <= end:
+                if start <= now < end:
+                    return rate
+            elif now >= start or now < end:
+                return rate
+        return self.default
+
+
+class BandwidthLimiter:
+    """
+    Thread-safe token bucket. consume(n) blocks the calling worker until
+    its n bytes fit under the cap; with no cap it returns immediately.
+    """
+
+    def __init__(self, schedule=None, limit_file=None, log=print):
+        self.schedule = schedule
+        self.limit_file = Path(limit_file) if limit_file else None
+        self.log = log
+
+        self.rate = 0
+        self._tokens = 0.0
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+        self._file_mtime = None
+        self._file_schedule = None
+        self._next_check = 0.0
+        self._refresh(self._stamp)
+
+    @property
+    def chunk_size(self):
+        """
+        Read size for capped downloads: small enough that a worker never
+        sits on more than one slice of unpaid data.
+        """
+        return SLICE if self.rate else None
+
+    def consume(self, n):
+        while n > 0:
+            part = min(n, SLICE)
+            n -= part
+            delay = self._reserve(part)
+            if delay > 0:
+                with profiling.stage("sleep"):
+                    time.sleep(delay)
+
+    def _reserve(self, n):
+        with self._lock:
+            now = time.monotonic()
+            if now >= self._next_check:
+                self._refresh(now)
+            if not self.rate:
+                self._stamp = now
+                return 0.0
+            burst = max(self.rate * BURST, SLICE)
+            self._tokens = min(burst, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            self._tokens -= n
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+    # -------------------- live adjustment --------------------
+
+    def _refresh(self, now):
+        self._next_check = now + CHECK_INTERVAL
+        schedule = self._read_limit_file() or self.schedule
+        rate = schedule.rate_at() if schedule else 0
+        if rate != self.rate:
+            self._set_rate(rate)
+
+    def _read_limit_file(self):
+        try:
+            mtime = self.limit_file.stat().st_mtime_ns if self.limit_file else None
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self._file_mtime:
+            self._file_mtime = mtime
+            self._file_schedule = None
+            if mtime is not None:
+                try:
+                    spec = self.limit_file.read_text(encoding="utf-8")
+                    self._file_schedule = Schedule(spec)
+                except (OSError, ValueError) as e:
+                    self.log(f"[!] Ignoring {self.limit_file}: {e}")
+        return self._file_schedule
+
+    def _set_rate(self, rate):
+        self.rate = rate
+        # don't let a raised cap release a burst saved up under the old one
+        self._tokens = min(self._tokens, rate * BURST)
+        if rate:
+            self.log(f"[~] Bandwidth limit: {rate / 1048576:.2f} MB/s")
+        else:
+            self.log("[~] Bandwidth limit: off")
@@ -0,0 +1,120 @@
+"""
+Retrying transient HTTP failures.
+
+Connection drops, timeouts, 429 and 5xx answers are retried with jittered
+exponential backoff; a Retry-After header from the server takes precedence
+over the computed delay. Anything else (404, a bad path, disk errors) fails
+straight away.
+"""
+
+import random
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+
+from oshodl import metrics, profiling
+
+RETRIES = 5  # attempts in total, including the first
+BASE_DELAY = 1.0  # seconds; doubled on every attempt
+MAX_DELAY = 60.0
+MAX_RETRY_AFTER = 300.0  # don't let a server park us for longer than this
+RETRY_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+RETRIES_TOTAL = metrics.counter(
+    "oshodl_retries_total", "Retried attempts by reason (status or error)", ["reason"]
+)
+
+
+class Incomplete(Exception):
+    """
+    Raised by a retried call whose work is unfinished but can be resumed,
+    e.g. a download that ended short of its expected size.
+    """
+
+    def __init__(self, message, size=None):
+        super().__init__(message)
+        self.size = size
+
+
+def status_of(exc):
+    response = getattr(exc, "response", None)
+    return response.status_code if response is not None else None
+
+
+def is_transient(exc):
+    if isinstance(exc, Incomplete):
+        return True
+    if isinstance(exc, requests.exceptions.HTTPError):
+        return status_of(exc) in RETRY_STATUS
+    return isinstance(
+        exc,
+        (
+            requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout,
+            requests.exceptions.ChunkedEncodingError,
+            requests.exceptions.ContentDecodingError,
+        ),
+    )
+
+
+def retry_after(exc):
+    """
+    Seconds asked for by a Retry-After header (delta or HTTP date), or None.
+    """
+    response = getattr(exc, "response", None)
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+
+def backoff(attempt, base=BASE_DELAY, cap=MAX_DELAY):
+    """
+    "Full jitter" delay before retry number attempt (1-based): uniform in
+    [0, base * 2^(attempt-1)], so failing clients don't retry in lockstep.
+    """
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+def describe(exc):
+    status = status_of(exc)
+    if status is not None:
+        return f"HTTP {status}"
+    text = str(exc)
+    if len(text) > 80:
+        text = text[:77] + "..."
+    return f"{type(exc).__name__}: {text}" if text else type(exc).__name__
+
+
+def with_retries(fn, retries=RETRIES, what="Request", on_error=None, log=print):
+    """
+    Call fn() until it succeeds, retrying transient failures up to retries
+    attempts in total. on_error(exc) is told about every failed attempt.
+    The last exception is re-raised once retries run out.
+    """
+    for attempt in range(1, retries + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if on_error:
+                on_error(e)
+            if attempt == retries or not is_transient(e):
+                raise
+            RETRIES_TOTAL.inc(reason=status_of(e) or type(e).__name__)
+            delay = retry_after(e)
+            if delay is None:
+                delay = backoff(attempt)
+            log(
+                f"    [!] {what}: {describe(e)}, retrying in {delay:.1f}s "
+                f"({attempt}/{retries - 1})"
+            )
+            with profiling.stage("sleep"):
+                time.sleep(delay)
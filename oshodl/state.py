@@ -0,0 +1,192 @@
+"""
+Persistent per-episode download state.
+
+One SQLite row per episode, keyed by the episode's `file` path on the
+server, records where it was saved, its status (done / partial / failed /
+downloading), byte counts, checksum and the last attempt. The scheduler
+loads the finished set once and skips those episodes without touching the
+filesystem.
+
+Two side tables serve the download planner: sizes caches Content-Length
+answers for episodes not downloaded yet, and meta keeps small values such
+as the throughput of the last run.
+"""
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from oshodl import profiling
+
+STATE_NAME = ".state.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS episodes (
+    file TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    status TEXT NOT NULL,
+    bytes INTEGER,
+    expected INTEGER,
+    sha256 TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_attempt REAL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS episodes_status ON episodes(status);
+CREATE TABLE IF NOT EXISTS sizes (
+    file TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    checked REAL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value
+);
+"""
+
+
+class DownloadState:
+    """
+    Thread-safe: all workers share one connection behind a lock. Every
+    update is committed immediately (WAL mode keeps that cheap).
+    """
+
+    def __init__(self, path):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def _execute(self, sql, args=()):
+        with self._lock, profiling.stage("sqlite"):
+            return self.conn.execute(sql, args).fetchall()
+
+    def done_paths(self):
+        """
+        {file: path} of every finished episode, for O(1) skip checks.
+        """
+        rows = self._execute("SELECT file, path FROM episodes WHERE status = 'done'")
+        return {r["file"]: r["path"] for r in rows}
+
+    def rows(self, status=None):
+        if status:
+            return self._execute("SELECT * FROM episodes WHERE status = ?", (status,))
+        return self._execute("SELECT * FROM episodes")
+
+    def get(self, file):
+        rows = self._execute("SELECT * FROM episodes WHERE file = ?", (file,))
+        return rows[0] if rows else None
+
+    def started(self, file, path):
+        self._execute(
+            "INSERT INTO episodes (file, path, status, attempts, last_attempt)"
+            " VALUES (?, ?, 'downloading', 1, ?)"
+            " ON CONFLICT(file) DO UPDATE SET path = excluded.path,"
+            " status = 'downloading', attempts = attempts + 1,"
+            " last_attempt = excluded.last_attempt, error = NULL",
+            (file, str(path), time.time()),
+        )
+
+    def finished(self, file, path, size, expected=None, sha256=None):
+        self._execute(
+            "INSERT INTO episodes (file, path, status, bytes, expected, sha256, last_attempt)"
+            " VALUES (?, ?, 'done', ?, ?, ?, ?)"
+            " ON CONFLICT(file) DO UPDATE SET path = excluded.path, status = 'done',"
+            " bytes = excluded.bytes,"
+            " expected = COALESCE(excluded.expected, expected),"
+            " sha256 = excluded.sha256,"
+            " last_attempt = excluded.last_attempt, error = NULL",
+            (file, str(path), size, expected, sha256, time.time()),
+        )
+
+    def partial(self, file, path, size, expected=None, error=None):
+        self._set_unfinished("partial", file, path, size, expected, error)
+
+    def failed(self, file, path, size, expected=None, error=None):
+        self._set_unfinished("failed", file, path, size, expected, error)
+
+    def _set_unfinished(self, status, file, path, size, expected, error):
+        self._execute(
+            "INSERT INTO episodes (file, path, status, bytes, expected, last_attempt, error)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT(file) DO UPDATE SET path = excluded.path,"
+            " status = excluded.status, bytes = excluded.bytes,"
+            " expected = COALESCE(excluded.expected, expected),"
+            " last_attempt = excluded.last_attempt, error = excluded.error",
+            (file, str(path), status, size, expected, time.time(), error),
+        )
+
+    def known_sizes(self):
+        """
+        {file: size} from finished or started downloads and earlier HEAD
+        requests.
+        """
+        sizes = {r["file"]: r["size"] for r in self._execute("SELECT file, size FROM sizes")}
+        rows = self._execute("SELECT file, expected FROM episodes WHERE expected IS NOT NULL")
+        sizes.update((r["file"], r["expected"]) for r in rows)
+        return sizes
+
+    def remember_sizes(self, sizes):
+        now = time.time()
+        with self._lock, profiling.stage("sqlite"):
+            self.conn.execute("BEGIN")
+            try:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO sizes (file, size, checked) VALUES (?, ?, ?)",
+                    [(file, size, now) for file, size in sizes.items()],
+                )
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def get_meta(self, key, default=None):
+        rows = self._execute("SELECT value FROM meta WHERE key = ?", (key,))
+        return rows[0]["value"] if rows else default
+
+    def set_meta(self, key, value):
+        self._execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def counts(self):
+        rows = self._execute("SELECT status, COUNT(*) AS n FROM episodes GROUP BY status")
+        return {r["status"]: r["n"] for r in rows}
+
+    def replace_all(self, records):
+        """
+        Replace every row with records: dicts with file, path, status, bytes
+        and optionally expected / sha256 / attempts / last_attempt / error.
+        """
+        with self._lock:
+            self.conn.execute("BEGIN")
+            try:
+                self.conn.execute("DELETE FROM episodes")
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO episodes"
+                    " (file, path, status, bytes, expected, sha256, attempts, last_attempt, error)"
+                    " VALUES (:file, :path, :status, :bytes, :expected, :sha256,"
+                    " :attempts, :last_attempt, :error)",
+                    [
+                        {
+                            "expected": None,
+                            "sha256": None,
+                            "attempts": 0,
+                            "last_attempt": None,
+                            "error": None,
+                            **r,
+                        }
+                        for r in records
+                    ],
+                )
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
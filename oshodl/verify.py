@@ -0,0 +1,202 @@
+"""
+Checksum manifests and file checks for downloaded episodes.
+
+Every series folder gets a .manifest.json listing its episode files by
+name with the server path they came from, size, SHA-256 and the result of
+an MP3 sanity check. The downloader adds an entry when it has finished
+downloading an episode (or linked one in from another folder), not for
+files that were already there; `downloader.py verify` re-hashes the tree
+against them and adopts files that have none yet.
+
+check_file() is what the verify command runs in its worker processes:
+files of MMAP_MIN bytes or more are hashed through mmap, so the data goes
+from the page cache to hashlib without being copied into Python objects,
+smaller ones through one reused buffer.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+from oshodl import profiling
+
+MANIFEST_NAME = ".manifest.json"
+MMAP_MIN = 8 * 1024 * 1024  # hash files at least this big through mmap
+BLOCK = 1024 * 1024
+FRAMES = 4  # consecutive MPEG frames the MP3 check wants to see
+TAIL = 4096  # this many zero bytes at the end can't be MP3 audio
+
+_lock = threading.Lock()  # manifests are rewritten by several workers
+
+
+# -----------------------------
+# hashing and MP3 check
+# -----------------------------
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size >= MMAP_MIN:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if hasattr(mmap, "MADV_SEQUENTIAL"):
+                    mm.madvise(mmap.MADV_SEQUENTIAL)
+                digest.update(mm)
+        else:
+            buf = memoryview(bytearray(BLOCK))
+            while n := f.readinto(buf):
+                digest.update(buf[:n])
+    return digest.hexdigest()
+
+
+# kbit/s by bitrate index, for (MPEG-1, layer) and (MPEG-2 / 2.5, layer)
+_BITRATES = {
+    (1, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (1, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (1, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_BITRATES[(2, 3)] = _BITRATES[(2, 2)]
+# Hz by sample rate index, for MPEG-1, 2 and 2.5
+_RATES = {1: (44100, 48000, 32000), 2: (22050, 24000, 16000), 25: (11025, 12000, 8000)}
+_VERSIONS = {0b11: 1, 0b10: 2, 0b00: 25}
+_LAYERS = {0b11: 1, 0b10: 2, 0b01: 3}
+
+
+def frame_length(header):
+    """
+    Length in bytes of the MPEG audio frame starting with the 4 bytes
+    header, or None if they aren't a valid frame header. Free-format
+    frames count as invalid.
+    """
+    if len(header) < 4 or header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return None
+    version = _VERSIONS.get((header[1] >> 3) & 3)
+    layer = _LAYERS.get((header[1] >> 1) & 3)
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 3
+    if version is None or layer is None or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    bitrate = _BITRATES[(1 if version == 1 else 2, layer)][bitrate_index] * 1000
+    rate = _RATES[version][rate_index]
+    padding = (header[2] >> 1) & 1
+    if layer == 1:
+        return (12 * bitrate // rate + padding) * 4
+    if layer == 3 and version != 1:
+        return 72 * bitrate // rate + padding
+    return 144 * bitrate // rate + padding
+
+
+def mp3_ok(path):
+    """
+    Cheap sanity check of an MP3 file: after any ID3v2 tag, FRAMES valid
+    frame headers in a row, each where the previous frame's length says,
+    and no run of TAIL zero bytes at the end (what a preallocated file
+    whose download never finished looks like).
+    """
+    with open(path, "rb") as f:
+        head = f.read(10)
+        start = 0
+        if head[:3] == b"ID3" and len(head) == 10:
+            # syncsafe size, plus the footer if there is one
+            start = 10 + sum((b & 0x7F) << (7 * (3 - i)) for i, b in enumerate(head[6:10]))
+            if head[5] & 0x10:
+                start += 10
+        pos = start
+        for _ in range(FRAMES):
+            f.seek(pos)
+            length = frame_length(f.read(4))
+            if not length:
+                return False
+            pos += length
+
+        size = os.fstat(f.fileno()).st_size
+        if size >= start + TAIL:
+            f.seek(size - TAIL)
+            if not f.read(TAIL).strip(b"\0"):
+                return False
+    return True
+
+
+def check_file(path, frames=False):
+    """
+    (path, sha256, MP3 check or None, error) for one file; run in a worker
+    process by the verify command. The MP3 check only runs with frames.
+    """
+    try:
+        sha256 = file_sha256(path)
+        mp3 = mp3_ok(path) if frames and path.lower().endswith(".mp3") else None
+    except OSError as e:
+        return path, None, None, str(e)
+    return path, sha256, mp3, None
+
+
+# -----------------------------
+# manifests
+# -----------------------------
+def load_manifest(folder):
+    """
+    {file name: entry} from folder's manifest ({} if it has none).
+    """
+    try:
+        with open(Path(folder) / MANIFEST_NAME, encoding="utf-8") as f:
+            return json.load(f).get("files", {})
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(folder, entries):
+    """
+    Write folder's manifest (under a temp name, renamed into place), or
+    remove it when entries is empty.
+    """
+    path = Path(folder) / MANIFEST_NAME
+    if not entries:
+        path.unlink(missing_ok=True)
+        return
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f"{MANIFEST_NAME}.", suffix=".tmp")
+    try:
+        with profiling.stage("disk"), os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "files": dict(sorted(entries.items()))}, f, indent=1)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def entry_for(file, size, sha256, mp3=None):
+    return {"file": file, "size": size, "sha256": sha256, "mp3": mp3}
+
+
+def record(path, file, size, sha256):
+    """
+    Add (or replace) path's entry in its folder's manifest, with the MP3
+    check run on it now.
+    """
+    path = Path(path)
+    mp3 = mp3_ok(path) if path.suffix.lower() == ".mp3" else None
+    with _lock:
+        entries = load_manifest(path.parent)
+        entries[path.name] = entry_for(file, size, sha256, mp3)
+        save_manifest(path.parent, entries)
+
+
+def copy_record(source, path):
+    """
+    Give path (a link or copy of source) source's manifest entry, if it has
+    one. Returns whether it did.
+    """
+    source, path = Path(source), Path(path)
+    with _lock:
+        entry = load_manifest(source.parent).get(source.name)
+        if entry is None:
+            return False
+        entries = load_manifest(path.parent)
+        entries[path.name] = entry
+        save_manifest(path.parent, entries)
+    return True
@@ -0,0 +1,165 @@
+"""
+Streaming a response body into a file.
+
+chunks() reads the body of a streamed response into one buffer that is
+allocated once per download and hands out memoryviews of it, so writing
+and hashing a chunk copies nothing and no bytes object is allocated per
+read. A plain (not content-encoded) body is read straight from the socket
+into that buffer; anything else goes through urllib3, which decodes it.
+
+The read size follows the measured throughput (ChunkSizer): small reads on
+a slow link keep progress and the bandwidth cap smooth, large ones on a
+fast link cut the per-read overhead.
+
+preallocate() reserves a file's blocks before the data arrives, so a full
+disk shows up when a download starts rather than halfway through it, and
+sync() flushes a finished file once, just before it is renamed into place.
+"""
+
+import errno
+import http.client
+import os
+import time
+
+import requests
+import urllib3
+
+from oshodl import profiling
+
+MIN_CHUNK = 64 * 1024
+MAX_CHUNK = 1024 * 1024  # also the buffer size; bigger reads gained nothing
+TARGET_READ = 0.1  # seconds a read should take
+
+# posix_fallocate errors meaning "not on this filesystem", not "disk full"
+UNSUPPORTED = {errno.EOPNOTSUPP, errno.EINVAL, errno.ENOSYS}
+
+
+class ChunkSizer:
+    """
+    Read size for one stream, a power of two between MIN_CHUNK and
+    MAX_CHUNK. It starts small, so a slow stream shows progress from the
+    first read, and doubles after every read that was much quicker than
+    TARGET_READ (halves after one much slower), one step at a time so a
+    burst of already-buffered data doesn't throw it to the top.
+    """
+
+    def __init__(self, size=MIN_CHUNK):
+        self.size = size
+
+    def update(self, n, seconds):
+        if n <= 0:
+            return self.size
+        # what a read of the full size would have taken
+        full = seconds * self.size / n
+        if full < TARGET_READ / 2 and self.size < MAX_CHUNK:
+            self.size *= 2
+        elif full > TARGET_READ * 2 and self.size > MIN_CHUNK:
+            self.size //= 2
+        return self.size
+
+
+class BodyReader:
+    """
+    readinto() for the body of streamed response r, raising the same
+    requests exceptions iter_content() would, so retries see no difference.
+    """
+
+    def __init__(self, r):
+        self.r = r
+        fp = getattr(r.raw, "_fp", None)
+        encoding = r.headers.get("Content-Encoding", "identity").strip().lower()
+        # http.client's response reads into the buffer without a copy
+        self._direct = fp if encoding in ("", "identity") and hasattr(fp, "readinto") else None
+
+    def readinto(self, buf):
+        if self._direct is not None:
+            try:
+                return self._direct.readinto(buf)
+            except TimeoutError as e:
+                raise requests.exceptions.ConnectionError(e) from e
+            except (http.client.HTTPException, OSError) as e:
+                raise requests.exceptions.ChunkedEncodingError(e) from e
+        try:
+            data = self.r.raw.read(len(buf), decode_content=True)
+        except urllib3.exceptions.ReadTimeoutError as e:
+            raise requests.exceptions.ConnectionError(e) from e
+        except urllib3.exceptions.DecodeError as e:
+            raise requests.exceptions.ContentDecodingError(e) from e
+        except urllib3.exceptions.ProtocolError as e:
+            raise requests.exceptions.ChunkedEncodingError(e) from e
+        buf[: len(data)] = data
+        return len(data)
+
+    def release(self):
+        """
+        Hand the connection back to the pool once the body has been read
+        to the end (urllib3 only notices by itself when it did the reading).
+        """
+        if self._direct is not None and self._direct.isclosed():
+            self.r.raw.release_conn()
+
+
+def chunks(r, limit=None, cap=None):
+    """
+    Yield the body of streamed response r (at most limit bytes) as
+    memoryviews of a reused buffer; each is only valid until the next one
+    is asked for. cap, if given, is called before every read and returns
+    the largest read allowed right now (e.g. by a bandwidth cap) or None.
+    """
+    reader = BodyReader(r)
+    sizer = ChunkSizer()
+    buf = memoryview(bytearray(MAX_CHUNK))
+    left = limit
+    while left is None or left > 0:
+        size = sizer.size
+        most = cap() if cap else None
+        if most:
+            size = min(size, most)
+        if left is not None:
+            size = min(size, left)
+
+        start = time.perf_counter()
+        with profiling.stage("http.read"):
+            n = reader.readinto(buf[:size])
+        if not n:
+            break
+        sizer.update(n, time.perf_counter() - start)
+        if left is not None:
+            left -= n
+        yield buf[:n]
+    reader.release()
+
+
+def preallocate(f, offset, size):
+    """
+    Reserve the blocks of bytes offset..size of open file f, which also
+    extends it to size. Returns False, leaving f untouched, where the
+    platform or filesystem can't; running out of space raises OSError.
+    """
+    if not hasattr(os, "posix_fallocate") or size <= offset:
+        return False
+    try:
+        os.posix_fallocate(f.fileno(), offset, size - offset)
+    except OSError as e:
+        if e.errno in UNSUPPORTED:
+            return False
+        raise
+    return True
+
+
+def sync(f):
+    """
+    Flush open file f to disk, with fdatasync where there is one: it
+    skips the timestamps but still writes out the size.
+    """
+    with profiling.stage("disk"):
+        f.flush()
+        getattr(os, "fdatasync", os.fsync)(f.fileno())
+
+
+def sync_path(path):
+    """
+    sync() for a file written through other handles (the segments).
+    """
+    with open(path, "rb") as f:
+        sync(f)
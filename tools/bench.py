@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# bench.py
+# End-to-end benchmark against the local fake server: crawl time of both
+# structure builders, then download throughput, CPU and memory of the
+# downloader at several worker counts. Unix only (uses os.wait4).
+#
+#   python tools/bench.py --workers 1,2,4,8 --out bench.json
+#   python tools/bench.py --baseline bench.json --max-regression 0.2
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "tools"))
+from fake_server import Catalog, Settings, serve
+
+BUILDERS = {
+    "english": ROOT / "tools" / "structure_cache_english.py",
+    "hindi": ROOT / "tools" / "structure_cache_hindi.py",
+}
+
+# metrics where a bigger number is worse, checked against --baseline
+LOWER_IS_BETTER = ("seconds", "cpu_seconds", "max_rss_mb")
+HIGHER_IS_BETTER = ("mb_per_s",)
+
+
+def log(msg):
+    print(msg, flush=True)
+
+
+# -----------------------------
+# running one tool
+# -----------------------------
+def run(cmd, cwd, env, hits, stdin=None):
+    """
+    Run cmd to completion and return its wall time, CPU time, peak RSS and
+    the number of requests the fake server saw meanwhile.
+    """
+    before = sum(hits.values())
+    log_file = Path(cwd) / f"{Path(cmd[1]).stem}.log"
+    start = time.perf_counter()
+    with open(log_file, "a", encoding="utf-8") as out:
+        proc = subprocess.Popen(
+            cmd,
+            cwd=cwd,
+            env=env,
+            stdin=subprocess.PIPE,
+            stdout=out,
+            stderr=subprocess.STDOUT,
+            text=True,
+        )
+        if stdin:
+            proc.stdin.write(stdin)
+        proc.stdin.close()
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+    elapsed = time.perf_counter() - start
+
+    if proc.returncode != 0:
+        raise RuntimeError(f"{' '.join(map(str, cmd))} failed, see {log_file}")
+
+    return {
+        "seconds": round(elapsed, 3),
+        "cpu_seconds": round(usage.ru_utime + usage.ru_stime, 3),
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        "max_rss_mb": round(
+            usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1
+        ),
+        "requests": sum(hits.values()) - before,
+    }
+
+
+def tree_bytes(root):
+    return sum(p.stat().st_size for p in Path(root).rglob("*.mp3"))
+
+
+# -----------------------------
+# benchmarks
+# -----------------------------
+def bench_crawl(work, env, hits, args):
+    results = {}
+    for lang, builder in BUILDERS.items():
+        cmd = [sys.executable, str(builder), "--restart"]
+        if args.concurrency:
+            cmd += ["--concurrency", str(args.concurrency)]
+        r = run(cmd, work, env, hits)
+        log(f"[✓] Crawl {lang}: {r['seconds']}s, {r['requests']} requests")
+        results[lang] = r
+    return results
+
+
+def bench_download(work, env, hits, workers):
+    """
+    Download every English episode from scratch with a fixed worker count.
+    """
+    shutil.rmtree(work / "downloads", ignore_errors=True)
+    cmd = [
+        sys.executable,
+        str(ROOT / "downloader.py"),
+        "--min-workers",
+        str(workers),
+        "--max-workers",
+        str(workers),
+        # measure the transfer itself, comparable with older baselines
+        "--no-plan",
+    ]
+    # English, list all, select all
+    r = run(cmd, work, env, hits, stdin="1\n2\nall\n")
+    size = tree_bytes(work / "downloads")
+    r["bytes"] = size
+    r["mb_per_s"] = round(size / 1048576 / r["seconds"], 2)
+    log(
+        f"[✓] Download with {workers} workers: {r['mb_per_s']} MB/s "
+        f"({size / 1048576:.1f} MB in {r['seconds']}s, CPU {r['cpu_seconds']}s, "
+        f"RSS {r['max_rss_mb']} MB)"
+    )
+    return {"workers": workers, **r}
+
+
+# -----------------------------
+# baseline comparison
+# -----------------------------
+def flatten(results):
+    """
+    {"crawl.english.seconds": 1.2, "download.4.mb_per_s": 30.1, …}
+    """
+    flat = {}
+    for lang, r in results["crawl"].items():
+        for k, v in r.items():
+            flat[f"crawl.{lang}.{k}"] = v
+    for r in results["download"]:
+        for k, v in r.items():
+            if k != "workers":
+                flat[f"download.{r['workers']}.{k}"] = v
+    return flat
+
+
+def compare(results, baseline, max_regression):
+    """
+    Print the change of every timing / throughput metric against baseline.
+    Returns the metrics that got worse by more than max_regression.
+    """
+    new, old = flatten(results), flatten(baseline)
+    regressions = []
+    log("\n=== Compared with baseline ===")
+    for key in sorted(new.keys() & old.keys()):
+        metric = key.rsplit(".", 1)[1]
+        if metric not in LOWER_IS_BETTER + HIGHER_IS_BETTER or not old[key]:
+            continue
+        change = (new[key] - old[key]) / old[key]
+        worse = change if metric in LOWER_IS_BETTER else -change
+        flag = ""
+        if worse > max_regression:
+            flag = "  [!] regression"
+            regressions.append(key)
+        log(f"{key:40} {old[key]:>10} → {new[key]:<10} {change:+7.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark crawl and download speed offline")
+    parser.add_argument("--workers", default="1,2,4,8", help="worker counts to try")
+    parser.add_argument("--english", type=int, default=10, help="English series to serve")
+    parser.add_argument("--hindi", type=int, default=10, help="Hindi series to serve")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds per response")
+    parser.add_argument(
+        "--bandwidth", type=int, default=0, help="bytes/s per file stream (0 = unlimited)"
+    )
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--concurrency", type=int, help="crawler --concurrency")
+    parser.add_argument("--skip-crawl", action="store_true")
+    parser.add_argument("--out", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="earlier --out file to compare against")
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=0.25,
+        help="with --baseline, exit 1 if a metric is this much worse (default 0.25)",
+    )
+    parser.add_argument("--keep", action="store_true", help="keep the work directory")
+    args = parser.parse_args()
+
+    settings = Settings()
+    settings.latency = args.latency
+    settings.bandwidth = args.bandwidth
+    settings.error_rate = args.error_rate
+    catalog = Catalog(english=args.english, hindi=args.hindi)
+    server, url = serve(catalog=catalog, settings=settings)
+    hits = server.RequestHandlerClass.hits
+
+    work = Path(tempfile.mkdtemp(prefix="oshodl-bench-"))
+    env = {**os.environ, "OSHOWORLD_BASE": url}
+    log(f"[*] Fake server on {url}, working in {work}")
+
+    results = {
+        "config": {
+            "english": args.english,
+            "hindi": args.hindi,
+            "latency": args.latency,
+            "bandwidth": args.bandwidth,
+            "error_rate": args.error_rate,
+            "python": sys.version.split()[0],
+        },
+        "crawl": {},
+        "download": [],
+    }
+    try:
+        if args.skip_crawl:
+            # the downloader still needs a cache to pick episodes from
+            run([sys.executable, str(BUILDERS["english"])], work, env, hits)
+        else:
+            results["crawl"] = bench_crawl(work, env, hits, args)
+
+        for n in (int(x) for x in args.workers.split(",") if x.strip()):
+            results["download"].append(bench_download(work, env, hits, n))
+    finally:
+        server.shutdown()
+        if args.keep:
+            log(f"[i] Kept {work}")
+        else:
+            shutil.rmtree(work, ignore_errors=True)
+
+    if args.out:
+        Path(args.out).write_text(json.dumps(results, indent=2), encoding="utf-8")
+        log(f"[✓] Results written to {args.out}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        regressions = compare(results, baseline, args.max_regression)
+        if regressions:
+            log(f"[!] {len(regressions)} metrics regressed by more than {args.max_regression:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n[!] Interrupted by user. Exiting cleanly.")
+        sys.exit(0)
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+# bench_structure_load.py
+# Compare the ways of searching a structure cache on a synthetic catalog:
+# json.load of the whole file, the streaming reader (oshodl.jsonstream) and
+# the compact memory-mapped catalog (oshodl.compact). Each runs in a fresh
+# process doing what a search does: match every series title against a
+# regex, then load the matching series in full. Peak RSS includes pages of
+# mapped files (the compact catalog), which are shown separately as they
+# are shared page cache rather than allocated memory. Unix only (os.wait4).
+#
+#   python tools/bench_structure_load.py --episodes 50000
+#   python tools/bench_structure_load.py --episodes 200000 --out load.json
+
+import argparse
+import json
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+MODES = ("baseline", "json", "stream", "compact")
+WORDS = "love meditation awareness zen truth life death silence the of and is".split()
+
+
+def log(msg):
+    print(msg, flush=True)
+
+
+# -----------------------------
+# synthetic catalog
+# -----------------------------
+def make_catalog(path, episodes, per_series, words, seed=1):
+    """
+    Write an English-format cache (indent=2, like the builders) with the
+    given number of episodes, per_series to a series.
+    """
+    rnd = random.Random(seed)
+    series = []
+    for i in range(-(-episodes // per_series)):
+        slug = f"series-{i:06d}"
+        count = min(per_series, episodes - i * per_series)
+        series.append(
+            {
+                "title": f"Series {i:06d} {rnd.choice(WORDS).title()}",
+                "slug": slug,
+                "series_id": f"{i:024x}",
+                "count": count,
+                "episodes": [
+                    {
+                        "title": f"Series {i:06d} {n:02d}",
+                        "slug": f"{slug}-{n:02d}",
+                        "duration": f"{rnd.randint(30, 120)}:{rnd.randint(0, 59):02d}",
+                        "file": f"/audio/english/{slug}/{slug}-{n:02d}.mp3",
+                        "description": "<p>"
+                        + " ".join(rnd.choice(WORDS) for _ in range(words))
+                        + "</p>",
+                    }
+                    for n in range(1, count + 1)
+                ],
+            }
+        )
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"language": "english", "series": series}, f, indent=2, ensure_ascii=False)
+
+
+# -----------------------------
+# one search, run in a child process
+# -----------------------------
+def file_backed_mb():
+    """
+    Resident pages of mapped files (Linux): for the compact catalog this is
+    page cache shared with the OS, not memory the process allocated.
+    """
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("RssFile:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def search(mode, path, pattern):
+    rx = re.compile(pattern, re.I)
+    if mode == "baseline":
+        return 0, 0, file_backed_mb()
+    if mode == "json":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        picked = [s for s in data["series"] if rx.search(s["title"])]
+    elif mode == "stream":
+        from oshodl.jsonstream import iter_array
+
+        with open(path, encoding="utf-8") as f:
+            picked = [s for s in iter_array(f, key="series") if rx.search(s["title"])]
+    else:
+        from oshodl.compact import open_compact
+
+        packed = open_compact(Path(path).with_suffix(".bin"), path)
+        if packed is None:
+            raise RuntimeError("compact catalog missing or stale")
+        with packed:
+            picked = [packed.entry(i) for i, t in enumerate(packed.titles()) if rx.search(t)]
+            # measured while the compact catalog is still mapped
+            return len(picked), sum(len(s["episodes"]) for s in picked), file_backed_mb()
+    return len(picked), sum(len(s["episodes"]) for s in picked), file_backed_mb()
+
+
+def prepare(path, episodes, per_series, words):
+    """
+    Write the JSON catalog and its compact form; returns the seconds the
+    compact one took.
+    """
+    from oshodl.compact import write_compact
+    from oshodl.jsonstream import iter_array
+
+    make_catalog(path, episodes, per_series, words)
+    start = time.perf_counter()
+    with open(path, encoding="utf-8") as f:
+        write_compact(path.with_suffix(".bin"), iter_array(f, key="series"), path)
+    return time.perf_counter() - start
+
+
+def child(mode, path, pattern):
+    start = time.perf_counter()
+    series, episodes, file_mb = search(mode, path, pattern)
+    result = {
+        "inner_seconds": round(time.perf_counter() - start, 4),
+        "series": series,
+        "episodes": episodes,
+        "file_mb": file_mb,
+    }
+    print(json.dumps(result))
+
+
+def run_mode(mode, path, pattern):
+    """
+    Run one search in a fresh interpreter; returns its timings, peak RSS and
+    what it found.
+    """
+    cmd = [sys.executable, __file__, "--child", mode, str(path), pattern]
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    out = proc.stdout.read()
+    _, status, usage = os.wait4(proc.pid, 0)
+    elapsed = time.perf_counter() - start
+    if os.waitstatus_to_exitcode(status) != 0:
+        raise RuntimeError(f"{mode} search failed")
+    return {
+        "mode": mode,
+        "seconds": round(elapsed, 3),
+        "cpu_seconds": round(usage.ru_utime + usage.ru_stime, 3),
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        "max_rss_mb": round(
+            usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1
+        ),
+        **json.loads(out),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark structure cache loading and search")
+    parser.add_argument("--episodes", type=int, default=50_000, help="episodes in the catalog")
+    parser.add_argument("--per-series", type=int, default=25, help="episodes per series")
+    parser.add_argument("--words", type=int, default=80, help="words per description")
+    parser.add_argument("--regex", default=r"\bzen\b", help="series title search")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per mode (best is kept)")
+    parser.add_argument("--out", help="write results as JSON to this file")
+    parser.add_argument("--child", nargs=3, metavar=("MODE", "PATH", "REGEX"), help=argparse.SUPPRESS)
+    parser.add_argument("--prepare", metavar="PATH", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(*args.child)
+        return
+    if args.prepare:
+        build = prepare(Path(args.prepare), args.episodes, args.per_series, args.words)
+        print(round(build, 3))
+        return
+
+    work = Path(tempfile.mkdtemp(prefix="oshodl-load-"))
+    try:
+        path = work / "structure_english.json"
+        # in a child, so this process stays small: forked children start
+        # with its memory counted in their peak RSS
+        out = subprocess.run(
+            [
+                sys.executable,
+                __file__,
+                "--prepare",
+                str(path),
+                "--episodes",
+                str(args.episodes),
+                "--per-series",
+                str(args.per_series),
+                "--words",
+                str(args.words),
+            ],
+            check=True,
+            stdout=subprocess.PIPE,
+            text=True,
+        ).stdout
+        build = float(out)
+        size = path.stat().st_size
+        log(f"[*] Catalog: {args.episodes} episodes, {size / 1048576:.1f} MB of JSON")
+        log(
+            f"[*] Compact catalog: {path.with_suffix('.bin').stat().st_size / 1048576:.1f} MB, "
+            f"written in {build:.2f}s"
+        )
+
+        results = []
+        for mode in MODES:
+            runs = [run_mode(mode, path, args.regex) for _ in range(max(args.repeat, 1))]
+            results.append(min(runs, key=lambda r: r["seconds"]))
+
+        log(
+            f"\n{'mode':10} {'wall s':>8} {'search s':>9} {'cpu s':>7} {'rss MB':>8} "
+            f"{'of it file':>10}  found"
+        )
+        for r in results:
+            file_mb = f"{r['file_mb']:10.1f}" if r["file_mb"] is not None else f"{'-':>10}"
+            log(
+                f"{r['mode']:10} {r['seconds']:8.3f} {r['inner_seconds']:9.3f} "
+                f"{r['cpu_seconds']:7.3f} {r['max_rss_mb']:8.1f} {file_mb}  "
+                f"{r['series']} series / {r['episodes']} episodes"
+            )
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+    if args.out:
+        report = {
+            "config": {
+                "episodes": args.episodes,
+                "per_series": args.per_series,
+                "words": args.words,
+                "regex": args.regex,
+                "json_bytes": size,
+                "compact_seconds": round(build, 3),
+                "python": sys.version.split()[0],
+            },
+            "results": results,
+        }
+        Path(args.out).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        log(f"[✓] Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n[!] Interrupted by user. Exiting cleanly.")
+        sys.exit(0)
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# bench_write_path.py
+# Micro-benchmark of the episode write path against the local fake server:
+# MB/s, CPU time and memory allocated per episode for the downloader's
+# download_episode (readinto into a reused buffer, preallocation, one
+# fsync per file) next to the loop it replaced (requests' iter_content with
+# a fresh 1 MB bytes object per chunk, appended to the file). Memory is
+# measured as the tracemalloc peak and the minor page faults (fresh pages
+# for big buffers) of each episode. The server runs in its own process, so
+# only the client is counted. Unix only (resource).
+#
+#   python tools/bench_write_path.py --episodes 20 --size 32
+#   python tools/bench_write_path.py --bandwidth 2000000 --out write.json
+
+import argparse
+import hashlib
+import json
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "tools"))
+from fake_server import Catalog, Settings, serve
+
+MODES = ("iter_content", "readinto")
+LEGACY_CHUNK = 1024 * 1024  # read size of the old loop
+
+
+def log(msg):
+    print(msg, flush=True)
+
+
+def make_catalog(episodes, size):
+    # one English series of equally sized episodes
+    return Catalog(english=1, hindi=0, episodes=(episodes, episodes), file_size=(size, size))
+
+
+# -----------------------------
+# the two write paths
+# -----------------------------
+def legacy_download(url, path):
+    """
+    The write loop as it was before readinto: iter_content, append, hash.
+    """
+    from oshodl.http_pool import get_pool
+
+    digest = hashlib.sha256()
+    with get_pool().get(url, stream=True, timeout=60) as r:
+        r.raise_for_status()
+        with open(path, "wb") as f:
+            for chunk in r.iter_content(chunk_size=LEGACY_CHUNK):
+                if not chunk:
+                    continue
+                f.write(chunk)
+                digest.update(chunk)
+    return path.stat().st_size
+
+
+class Quiet:
+    """
+    The monitor download_episode reports to, minus the scheduler.
+    """
+
+    chunk_size = None
+
+    def log(self, msg):
+        pass
+
+    def on_bytes(self, n):
+        pass
+
+
+def current_download(ep, folder):
+    import downloader
+
+    status, size, _, _ = downloader.download_episode(ep, folder, 1, 1, monitor=Quiet())
+    if status != "done":
+        raise RuntimeError(f"{ep['file']}: {status}")
+    return size
+
+
+# -----------------------------
+# measuring
+# -----------------------------
+def run_mode(mode, base, episodes, work, memory):
+    """
+    Download every episode once with mode. Returns the total seconds, CPU
+    seconds, minor page faults and bytes, and with memory the peak traced
+    allocation of each episode.
+    """
+    import downloader
+
+    downloader.BASE = base
+    folder = work / mode
+    shutil.rmtree(folder, ignore_errors=True)
+    folder.mkdir(parents=True)
+
+    seconds, cpu, faults, total, peaks = 0.0, 0.0, 0, 0, []
+    for ep in episodes:
+        if memory:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        start, start_cpu = time.perf_counter(), time.process_time()
+        start_faults = resource.getrusage(resource.RUSAGE_SELF).ru_minflt
+        if mode == "iter_content":
+            total += legacy_download(base + ep["file"], folder / Path(ep["file"]).name)
+        else:
+            total += current_download(ep, folder)
+        seconds += time.perf_counter() - start
+        cpu += time.process_time() - start_cpu
+        faults += resource.getrusage(resource.RUSAGE_SELF).ru_minflt - start_faults
+        if memory:
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    return seconds, cpu, faults, total, peaks
+
+
+def bench(mode, base, episodes, work, repeat):
+    best = None
+    for _ in range(max(repeat, 1)):
+        seconds, cpu, faults, total, _ = run_mode(mode, base, episodes, work, memory=False)
+        if best is None or seconds < best[0]:
+            best = (seconds, cpu, faults, total)
+    # allocations in a separate pass: tracemalloc slows everything down
+    tracemalloc.start()
+    try:
+        *_, peaks = run_mode(mode, base, episodes, work, memory=True)
+    finally:
+        tracemalloc.stop()
+    seconds, cpu, faults, total = best
+    return {
+        "mode": mode,
+        "seconds": round(seconds, 3),
+        "mb_per_s": round(total / 1048576 / seconds, 2),
+        # client side only: the server is another process
+        "cpu_s_per_gb": round(cpu / (total / 1024**3), 3),
+        "alloc_peak_kb": round(max(peaks) / 1024, 1),
+        "alloc_mean_kb": round(sum(peaks) / len(peaks) / 1024, 1),
+        "faults_per_episode": round(faults / len(episodes)),
+    }
+
+
+# -----------------------------
+# server process
+# -----------------------------
+def serve_child(episodes, size, bandwidth):
+    settings = Settings()
+    settings.bandwidth = bandwidth
+    server, url = serve(catalog=make_catalog(episodes, size), settings=settings)
+    print(url, flush=True)
+    # until the parent closes our stdin
+    sys.stdin.read()
+    server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the episode write path")
+    parser.add_argument("--episodes", type=int, default=20, help="episodes to download")
+    parser.add_argument("--size", type=float, default=16, help="episode size in MB")
+    parser.add_argument(
+        "--bandwidth", type=int, default=0, help="bytes/s per file stream (0 = unlimited)"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="runs per mode (best is kept)")
+    parser.add_argument("--out", help="write results as JSON to this file")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    size = int(args.size * 1048576)
+    if args.serve:
+        serve_child(args.episodes, size, args.bandwidth)
+        return
+
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            __file__,
+            "--serve",
+            "--episodes",
+            str(args.episodes),
+            "--size",
+            str(args.size),
+            "--bandwidth",
+            str(args.bandwidth),
+        ],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    work = Path(tempfile.mkdtemp(prefix="oshodl-write-"))
+    try:
+        base = server.stdout.readline().strip()
+        if not base:
+            raise RuntimeError("fake server didn't start")
+        episodes = make_catalog(args.episodes, size).series["english"][0]["episodes"]
+        log(
+            f"[*] {len(episodes)} episodes of {size / 1048576:.1f} MB from {base}, "
+            f"working in {work}"
+        )
+
+        results = [bench(mode, base, episodes, work, args.repeat) for mode in MODES]
+
+        log(
+            f"\n{'mode':14} {'seconds':>8} {'MB/s':>8} {'CPU s/GB':>9} "
+            f"{'alloc peak KB':>14} {'mean KB':>8} {'faults/ep':>10}"
+        )
+        for r in results:
+            log(
+                f"{r['mode']:14} {r['seconds']:8.3f} {r['mb_per_s']:8.2f} "
+                f"{r['cpu_s_per_gb']:9.3f} {r['alloc_peak_kb']:14.1f} {r['alloc_mean_kb']:8.1f} "
+                f"{r['faults_per_episode']:10}"
+            )
+    finally:
+        server.stdin.close()
+        server.wait()
+        shutil.rmtree(work, ignore_errors=True)
+
+    if args.out:
+        report = {
+            "config": {
+                "episodes": args.episodes,
+                "size_bytes": size,
+                "bandwidth": args.bandwidth,
+                "python": sys.version.split()[0],
+            },
+            "results": results,
+        }
+        Path(args.out).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        log(f"[✓] Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n[!] Interrupted by user. Exiting cleanly.")
+        sys.exit(0)
@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+# fake_server.py
+# Local stand-in for the parts of oshoworld.com the tools talk to, for
+# offline testing and benchmarks:
+#
+#   python tools/fake_server.py --port 8800 --latency 0.05
+#   OSHOWORLD_BASE=http://127.0.0.1:8800 python downloader.py
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+BUILD_ID = "fake-build-1"
+SERIES_PER_PAGE = 20
+SUBSERIES_PAGE_CAP = 16
+
+# One MPEG-1 Layer III frame: 128 kbps, 44.1 kHz, no padding -> 417 bytes
+FRAME_HEADER = b"\xff\xfb\x90\x00"
+FRAME_SIZE = 417
+
+
+# -----------------------------
+# synthetic catalog
+# -----------------------------
+class Catalog:
+    """
+    Deterministic fake catalog: the same seed always yields the same series,
+    episodes and file sizes, so crawls and downloads can be compared run to
+    run.
+    """
+
+    def __init__(
+        self,
+        seed=1,
+        english=30,
+        hindi=30,
+        containers=3,
+        subseries=6,
+        episodes=(1, 25),
+        file_size=(200_000, 2_000_000),
+        grow=0,
+        shared=0,
+    ):
+        rnd = random.Random(seed)
+        self._file_size = file_size
+        self.series = {"english": [], "hindi": []}
+        self.by_slug = {}  # slug -> series / sub-series record
+        self.by_id = {}  # _id -> record
+        self.files = {}  # file path -> size
+
+        for lang, count in (("english", english), ("hindi", hindi)):
+            for i in range(count):
+                container = lang == "hindi" and i < containers
+                rec = self._make(rnd, lang, f"{lang}-series-{i:04d}", episodes, file_size)
+                if container:
+                    rec["episodes"] = []
+                    rec["subseries"] = [
+                        self._make(
+                            rnd, lang, f"{rec['slug']}-part-{j:03d}", episodes, file_size
+                        )
+                        for j in range(subseries)
+                    ]
+                self.series[lang].append(rec)
+
+        # Like the real site, where containers collect episodes that are
+        # also listed as standalone series: the first `shared` standalone
+        # Hindi series list the same files as the containers' sub-series
+        parts = [ss for rec in self.series["hindi"] for ss in rec.get("subseries", [])]
+        standalone = [rec for rec in self.series["hindi"] if "subseries" not in rec]
+        for rec, ss in zip(standalone[:shared], parts):
+            rec["episodes"] = [dict(ep) for ep in ss["episodes"]]
+
+        for lang in self.series:
+            self.series[lang].sort(key=lambda r: r["title"])
+
+        # Simulate new uploads: one more episode on the first `grow` series
+        # (and the last sub-series of a container) of each language
+        for lang in self.series:
+            for rec in self.series[lang][:grow]:
+                target = rec["subseries"][-1] if "subseries" in rec else rec
+                self._add_episode(rnd, lang, target)
+
+    def _add_episode(self, rnd, lang, rec):
+        n = len(rec["episodes"]) + 1
+        slug = rec["slug"]
+        path = f"/audio/{lang}/{slug}/{slug}-{n:02d}.mp3"
+        size = rnd.randint(*self._file_size)
+        self.files[path] = size
+        rec["episodes"].append(
+            {
+                "_id": hashlib.md5(path.encode()).hexdigest()[:24],
+                "title": f"{rec['title']} {n:02d}",
+                "slug": f"{slug}-{n:02d}",
+                "audio_index": n,
+                "duration": f"{size * 8 // 128_000 // 60:02d}:{size * 8 // 128_000 % 60:02d}",
+                "file": path,
+                "description": f"<p>Discourse {n} of {rec['title']}.</p>",
+            }
+        )
+
+    def _make(self, rnd, lang, slug, episodes, file_size):
+        _id = hashlib.md5(slug.encode()).hexdigest()[:24]
+        title = f"{slug.replace('-', ' ').title()}"
+        eps = []
+        for n in range(1, rnd.randint(*episodes) + 1):
+            path = f"/audio/{lang}/{slug}/{slug}-{n:02d}.mp3"
+            size = rnd.randint(*file_size)
+            self.files[path] = size
+            eps.append(
+                {
+                    "_id": hashlib.md5(path.encode()).hexdigest()[:24],
+                    "title": f"{title} {n:02d}",
+                    "slug": f"{slug}-{n:02d}",
+                    "audio_index": n,
+                    "duration": f"{size * 8 // 128_000 // 60:02d}:{size * 8 // 128_000 % 60:02d}",
+                    "file": path,
+                    "description": f"<p>Discourse {n} of {title}.</p>",
+                }
+            )
+        rec = {"_id": _id, "title": title, "slug": slug, "episodes": eps}
+        self.by_slug[slug] = rec
+        self.by_id[_id] = rec
+        return rec
+
+    def series_item(self, rec):
+        if "subseries" in rec:
+            return {"title": rec["title"], "slug": rec["slug"], "countSeries": len(rec["subseries"])}
+        return {"title": rec["title"], "slug": rec["slug"], "count": len(rec["episodes"])}
+
+
+def file_bytes(path, start, end):
+    """
+    Bytes start..end (inclusive) of a fake MP3: a run of valid frame
+    headers with payload derived from the path, so content is reproducible
+    and a frame-sync check passes.
+    """
+    seed = hashlib.sha256(path.encode()).digest()
+    payload = (seed * (FRAME_SIZE // len(seed) + 1))[: FRAME_SIZE - len(FRAME_HEADER)]
+    frame = FRAME_HEADER + payload
+    first = start // FRAME_SIZE
+    last = end // FRAME_SIZE
+    blob = frame * (last - first + 1)
+    off = start - first * FRAME_SIZE
+    return blob[off : off + end - start + 1]
+
+
+# -----------------------------
+# HTTP handler
+# -----------------------------
+class Settings:
+    latency = 0.0  # seconds added to every response
+    bandwidth = 0  # bytes/second per file stream, 0 = unlimited
+    error_rate = 0.0  # fraction of requests answered with error_status
+    error_status = 503
+    ranges = True
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    catalog = None
+    settings = Settings()
+    hits = {}
+    hits_lock = threading.Lock()
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _count(self, key):
+        with self.hits_lock:
+            self.hits[key] = self.hits.get(key, 0) + 1
+
+    def _send_json(self, obj, status=200):
+        body = json.dumps(obj).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_html(self, html):
+        body = html.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _inject(self):
+        """
+        Apply latency and error injection. Returns True if an error
+        response was sent.
+        """
+        if self.settings.latency:
+            time.sleep(self.settings.latency)
+        if self.settings.error_rate and random.random() < self.settings.error_rate:
+            self.send_response(self.settings.error_status)
+            if self.settings.error_status in (429, 503):
+                self.send_header("Retry-After", "1")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            self._count("error")
+            return True
+        return False
+
+    def do_HEAD(self):
+        self._get(head=True)
+
+    def do_GET(self):
+        self._get()
+
+    def _get(self, head=False):
+        path = urlsplit(self.path).path
+        if self._inject():
+            return
+
+        if path in ("/", "/audio-hindi"):
+            self._count("page")
+            return self._send_html(
+                f'<html><script id="__NEXT_DATA__">{{"buildId":"{BUILD_ID}"}}</script></html>'
+            )
+        if path == "/audio-english":
+            self._count("page")
+            return self._send_html(
+                f'<html><script src="/_next/static/{BUILD_ID}/_buildManifest.js"></script></html>'
+            )
+
+        m = re.fullmatch(r"/_next/data/([^/]+)/(.+)\.json", path)
+        if m:
+            self._count("_next/data")
+            rec = self.catalog.by_slug.get(m.group(2))
+            if m.group(1) != BUILD_ID or rec is None:
+                return self._send_json({"notFound": True}, 404)
+            page_data = {
+                "categoryData": {"_id": rec["_id"], "title": rec["title"]},
+                "listData": rec["episodes"][:10],
+                "total": len(rec["episodes"]),
+            }
+            return self._send_json({"pageProps": {"data": {"pageData": page_data}}})
+
+        if path in self.catalog.files:
+            self._count("file")
+            return self._send_file(path, head)
+
+        self._send_json({"error": "not found"}, 404)
+
+    def _send_file(self, path, head):
+        total = self.catalog.files[path]
+        start, end, status = 0, total - 1, 200
+
+        rng = self.headers.get("Range")
+        if rng and self.settings.ranges:
+            m = re.fullmatch(r"bytes=(\d+)-(\d*)", rng.strip())
+            if m:
+                start = int(m.group(1))
+                if m.group(2):
+                    end = min(int(m.group(2)), total - 1)
+                if start >= total:
+                    self.send_response(416)
+                    self.send_header("Content-Range", f"bytes */{total}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                status = 206
+
+        self.send_response(status)
+        self.send_header("Content-Type", "audio/mpeg")
+        self.send_header("Content-Length", str(end - start + 1))
+        if self.settings.ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{total}")
+        self.end_headers()
+        if head:
+            return
+
+        block = 64 * 1024
+        pos = start
+        try:
+            while pos <= end:
+                last = min(pos + block - 1, end)
+                self.wfile.write(file_bytes(path, pos, last))
+                if self.settings.bandwidth:
+                    time.sleep((last - pos + 1) / self.settings.bandwidth)
+                pos = last + 1
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        if self._inject():
+            return
+
+        if path == "/api/server/audio/filter":
+            # landing data: direct series and master categories
+            self._count("filter")
+            items = self.catalog.series.get(payload.get("language"), [])
+            return self._send_json(
+                {
+                    "seriesData": [
+                        self.catalog.series_item(r) for r in items if "subseries" not in r
+                    ][:SERIES_PER_PAGE],
+                    "masterData": [
+                        self.catalog.series_item(r) for r in items if "subseries" in r
+                    ],
+                }
+            )
+
+        if path == "/api/server/audio/search-series-home":
+            self._count("search-series-home")
+            items = self.catalog.series.get(payload.get("language"), [])
+            page = int(payload.get("page", 1))
+            chunk = items[(page - 1) * SERIES_PER_PAGE : page * SERIES_PER_PAGE]
+            return self._send_json(
+                {
+                    "items": [self.catalog.series_item(r) for r in chunk],
+                    "total": [{"total": len(items)}],
+                }
+            )
+
+        if path == "/api/server/audio/series-filter":
+            self._count("series-filter")
+            rec = self.catalog.by_id.get(payload.get("currentId"))
+            if rec is None:
+                return self._send_json({"listData": [], "total": 0})
+            per_page = int(payload.get("perPage", 10))
+            page = int(payload.get("page", 1))
+            eps = rec["episodes"]
+            return self._send_json(
+                {
+                    "listData": eps[(page - 1) * per_page : page * per_page],
+                    "total": len(eps),
+                }
+            )
+
+        if path == "/api/server/audio/subseries-filter":
+            self._count("subseries-filter")
+            rec = self.catalog.by_id.get(payload.get("currentId"))
+            subs = rec.get("subseries", []) if rec else []
+            per_page = min(int(payload.get("perPage", 16)), SUBSERIES_PAGE_CAP)
+            page = int(payload.get("page", 1))
+            chunk = subs[(page - 1) * per_page : page * per_page]
+            return self._send_json(
+                {
+                    "listData": [
+                        {"title": s["title"], "slug": s["slug"], "count": len(s["episodes"])}
+                        for s in chunk
+                    ],
+                    "total": [{"total": len(subs)}],
+                }
+            )
+
+        self._send_json({"error": "not found"}, 404)
+
+
+def serve(host="127.0.0.1", port=0, catalog=None, settings=None):
+    """
+    Start the fake server in a background thread. Returns (server, base_url).
+    """
+    handler = type(
+        "BoundHandler",
+        (Handler,),
+        {
+            "catalog": catalog or Catalog(),
+            "settings": settings or Settings(),
+            "hits": {},
+        },
+    )
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for oshoworld.com")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--seed", type=int, default=1, help="catalog seed")
+    parser.add_argument("--english", type=int, default=30, help="English series")
+    parser.add_argument("--hindi", type=int, default=30, help="Hindi series")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per response")
+    parser.add_argument(
+        "--bandwidth", type=int, default=0, help="bytes/s per file stream (0 = unlimited)"
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="fraction of requests that fail"
+    )
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--no-ranges", action="store_true", help="ignore Range headers")
+    parser.add_argument(
+        "--grow", type=int, default=0, help="add an episode to the first N series"
+    )
+    parser.add_argument(
+        "--shared",
+        type=int,
+        default=0,
+        help="N standalone Hindi series reuse the files of container sub-series",
+    )
+    args = parser.parse_args()
+
+    settings = Settings()
+    settings.latency = args.latency
+    settings.bandwidth = args.bandwidth
+    settings.error_rate = args.error_rate
+    settings.error_status = args.error_status
+    settings.ranges = not args.no_ranges
+
+    catalog = Catalog(
+        seed=args.seed, english=args.english, hindi=args.hindi, grow=args.grow, shared=args.shared
+    )
+    server, url = serve(port=args.port, catalog=catalog, settings=settings)
+    print(f"[*] Fake oshoworld serving on {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print("\n[!] Interrupted by user. Exiting cleanly.")
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,14 +2,23 @@
 # structure_cache_english.py
 # Builds structure_english.json for English Osho audios
 
-import requests
+import argparse
+import os
 import re
-import json
 import math
+import sys
 import time
 from pathlib import Path
 
-BASE = "https://oshoworld.com"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from oshodl import metrics, profiling
+from oshodl.cache import Changelog, Journal, added_episodes, load_cache, write_json_atomic
+from oshodl.compact import write_compact
+from oshodl.crawl import CONCURRENCY, RPS, CrawlPool
+from oshodl.http_pool import configure as configure_http, get_pool
+from oshodl.retry import with_retries
+
+BASE = os.environ.get("OSHOWORLD_BASE", "https://oshoworld.com").rstrip("/")
 API_SERIES = f"{BASE}/api/server/audio/search-series-home"
 API_EPISODES = f"{BASE}/api/server/audio/series-filter"
 
@@ -20,6 +29,10 @@ HEADERS = {
 }
 
 OUT_FILE = Path("structure_english.json")
+COMPACT_FILE = Path("structure_english.bin")
+
+# replaced in main() once --concurrency / --rps are known
+CRAWL = CrawlPool()
 
 
 # -----------------------------
@@ -30,7 +43,7 @@ def get_build_id():
     Fetch BUILD_ID from /audio-english page
     """
     url = f"{BASE}/audio-english"
-    r = requests.get(url, headers=HEADERS, timeout=30)
+    r = get_pool().get(url, headers=HEADERS)
     r.raise_for_status()
 
     # look for /_next/static/<BUILD_ID>/_buildManifest.js
@@ -41,28 +54,26 @@ def get_build_id():
     return m.group(1)
 
 
-def post(url, payload, retries=3, delay=2):
-    for attempt in range(1, retries + 1):
-        try:
-            r = requests.post(
-                url,
-                json=payload,
-                headers=HEADERS,
-                timeout=30,
-            )
-            r.raise_for_status()
+def post(url, payload, retries=3):
+    def attempt():
+        CRAWL.throttle.wait()
+        r = get_pool().post(url, json=payload, headers=HEADERS)
+        r.raise_for_status()
+        with profiling.stage("json"):
             return r.json()
-        except requests.exceptions.RequestException as e:
-            if attempt == retries:
-                raise
-            print(f"    [!] Network error, retrying ({attempt}/{retries})...")
-            time.sleep(delay * attempt)
 
+    return with_retries(attempt, retries, what=url.removeprefix(BASE))
 
-def get_json(url):
-    r = requests.get(url, headers=HEADERS, timeout=30)
-    r.raise_for_status()
-    return r.json()
+
+def get_json(url, retries=3):
+    def attempt():
+        CRAWL.throttle.wait()
+        r = get_pool().get(url, headers=HEADERS)
+        r.raise_for_status()
+        with profiling.stage("json"):
+            return r.json()
+
+    return with_retries(attempt, retries, what=url.removeprefix(BASE))
 
 
 # -----------------------------
@@ -71,7 +82,6 @@ def get_json(url):
 def fetch_all_series():
     print("[*] Fetching English series list...")
 
-    page = 1
     all_items = []
 
     first = post(API_SERIES, {"page": 1, "sortBy": "name", "language": "english"})
@@ -81,11 +91,13 @@ def fetch_all_series():
 
     all_items.extend(first["items"])
 
-    for p in range(2, pages + 1):
+    def fetch_page(p):
         print(f"[>] POST search-series-home page={p}")
         data = post(API_SERIES, {"page": p, "sortBy": "name", "language": "english"})
-        all_items.extend(data["items"])
-        time.sleep(0.2)
+        return data["items"]
+
+    for items in CRAWL.map("pages", fetch_page, range(2, pages + 1)):
+        all_items.extend(items)
 
     print(f"[✓] Total series fetched: {len(all_items)}")
 
@@ -107,11 +119,11 @@ def resolve_series_id(build_id, slug):
 
 def fetch_all_episodes(series_id):
     """
-    Fetch all episodes for a series using series-filter
+    Fetch all episodes for a series using series-filter.
+    Pages after the first are fetched concurrently once total is known.
     """
     episodes = []
 
-    page = 1
     per_page = 10
 
     first = post(
@@ -124,79 +136,184 @@ def fetch_all_episodes(series_id):
 
     pages = math.ceil(total / per_page)
 
-    for p in range(2, pages + 1):
+    def fetch_page(p):
         data = post(
             API_EPISODES,
             {"currentId": series_id, "page": p, "perPage": per_page, "search": ""},
         )
-        episodes.extend(data["listData"])
-        time.sleep(0.2)
+        return data["listData"]
+
+    for items in CRAWL.map("pages", fetch_page, range(2, pages + 1)):
+        episodes.extend(items)
 
     return episodes
 
 
-def build_structure():
+def crawl_series(build_id, s):
+    """
+    Resolve one series and fetch its episodes. Returns the cache entry, or
+    None if the series_id can't be resolved.
+    """
+    title = s["title"]
+    slug = s["slug"]
+    count = s.get("count")
+
+    series_id = resolve_series_id(build_id, slug)
+    if not series_id:
+        print(f"  [!] Failed to resolve series_id for {title}, skipping")
+        return None
+
+    episodes_raw = fetch_all_episodes(series_id)
+
+    episodes = []
+    for ep in episodes_raw:
+        episodes.append(
+            {
+                "title": ep.get("title"),
+                "slug": ep.get("slug"),
+                "duration": ep.get("duration"),
+                "file": ep.get("file"),
+                "description": ep.get("description"),
+            }
+        )
+
+    return {
+        "title": title,
+        "slug": slug,
+        "count": count,
+        "series_id": series_id,
+        "episodes": episodes,
+    }
+
+
+def build_structure(previous=None, changelog=None, journal=None):
+    """
+    Crawl every English series. With a previous structure (--update), a
+    series whose slug and episode count are unchanged is reused as-is and
+    only new or changed series are re-crawled; additions go to changelog.
+    Each crawled series is recorded in journal, and series already in it
+    (from an interrupted run) are not fetched again.
+    """
     build_id = get_build_id()
     print(f"[✓] BUILD_ID: {build_id}")
 
     series_list = fetch_all_series()
+    total = len(series_list)
+    cached = {s["slug"]: s for s in (previous or {}).get("series", [])}
 
     structure = {
         "language": "english",
         "series": [],
     }
 
-    for idx, s in enumerate(series_list, 1):
-        title = s["title"]
-        slug = s["slug"]
-        count = s.get("count")
-
-        print(f"\n=== [{idx}] SERIES: {title} ===")
+    def crawl(item):
+        idx, s = item
+        old = cached.get(s["slug"])
+        if old is not None and old.get("count") == s.get("count"):
+            return {**old, "title": s["title"]}, old, False
+
+        if journal is not None and s["slug"] in journal:
+            return journal.get(s["slug"]), old, True
+
+        entry = crawl_series(build_id, s)
+        if entry and journal is not None:
+            journal.record(s["slug"], entry)
+        if entry:
+            print(
+                f"[+] [{idx}/{total}] {entry['title']}: "
+                f"{len(entry['episodes'])} episodes"
+            )
+        return entry, old, True
 
-        series_id = resolve_series_id(build_id, slug)
-        if not series_id:
-            print("  [!] Failed to resolve series_id, skipping")
+    # Series are crawled concurrently; map() keeps fetch_all_series order
+    recrawled = 0
+    for entry, old, fresh in CRAWL.map("series", crawl, enumerate(series_list, 1)):
+        if not entry:
             continue
-
-        episodes_raw = fetch_all_episodes(series_id)
-
-        episodes = []
-        for ep in episodes_raw:
-            episodes.append(
-                {
-                    "title": ep.get("title"),
-                    "slug": ep.get("slug"),
-                    "duration": ep.get("duration"),
-                    "file": ep.get("file"),
-                    "description": ep.get("description"),
-                }
+        structure["series"].append(entry)
+        if fresh:
+            recrawled += 1
+        if fresh and changelog is not None:
+            changelog.add(
+                entry["title"],
+                added_episodes(old and old["episodes"], entry["episodes"]),
+                new_series=old is None,
             )
 
-        print(f"    [+] Episodes: {len(episodes)}")
-
-        structure["series"].append(
-            {
-                "title": title,
-                "slug": slug,
-                "count": count,
-                "series_id": series_id,
-                "episodes": episodes,
-            }
-        )
+    if previous is not None:
+        print(f"[✓] Re-crawled {recrawled} of {total} series")
 
     return structure
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Build structure_english.json")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=CONCURRENCY,
+        help=f"parallel requests per crawl stage (default {CONCURRENCY})",
+    )
+    parser.add_argument(
+        "--rps",
+        type=float,
+        default=RPS,
+        help=f"max requests per second overall, 0 = unlimited (default {RPS:g})",
+    )
+    parser.add_argument(
+        "--update",
+        action="store_true",
+        help="refresh the existing cache, re-crawling only new or changed series",
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="ignore the journal of an interrupted run and crawl from scratch",
+    )
+    metrics.add_arguments(parser)
+    profiling.add_arguments(parser)
+    return parser.parse_args()
+
+
 def main():
+    global CRAWL
+    args = parse_args()
+    metrics.start(args, "structure_cache_english")
+    profiling.start(args, "structure_cache_english")
+    CRAWL = CrawlPool(concurrency=args.concurrency, rps=args.rps)
+    # series and page stages each hold up to `concurrency` connections
+    configure_http(pool_size=2 * args.concurrency)
+
+    previous = changelog = None
+    if args.update:
+        previous = load_cache(OUT_FILE)
+        if previous is None:
+            print(f"[!] No existing {OUT_FILE}, doing a full build")
+        else:
+            changelog = Changelog(OUT_FILE, "english")
+
+    journal = Journal(OUT_FILE, enabled=not args.restart)
+    if len(journal):
+        print(f"[*] Resuming interrupted build: {len(journal)} series already in {journal.path}")
+
     print("[*] Building English audio cache")
     start = time.time()
-    structure = build_structure()
+    try:
+        structure = build_structure(previous, changelog, journal)
+    finally:
+        CRAWL.close()
 
-    OUT_FILE.write_text(json.dumps(structure, indent=2, ensure_ascii=False))
+    write_json_atomic(OUT_FILE, structure)
+    write_compact(COMPACT_FILE, structure["series"], OUT_FILE)
+    journal.discard()
     elapsed = time.time() - start
     print(f"\n[✓] English cache written: {OUT_FILE}")
     print(f"[✓] Total series cached: {len(structure['series'])}")
+    if changelog is not None:
+        changelog.write()
+        print(f"[✓] New episodes: {changelog.episode_count()} (see {changelog.path})")
     print(f"[✓] Time taken: {elapsed:.1f}s")
+    print(f"[i] HTTP: {get_pool().stats.summary()}")
 
 
 if __name__ == "__main__":
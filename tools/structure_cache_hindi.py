@@ -1,64 +1,78 @@
-import requests, json, math
+import argparse, math, os, sys
+from pathlib import Path
 
-BASE = "https://oshoworld.com"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from oshodl import metrics, profiling
+from oshodl.cache import Changelog, Journal, added_episodes, load_cache, write_json_atomic
+from oshodl.compact import write_compact
+from oshodl.crawl import CONCURRENCY, RPS, CrawlPool
+from oshodl.http_pool import configure as configure_http, get_pool
+from oshodl.retry import with_retries
+
+BASE = os.environ.get("OSHOWORLD_BASE", "https://oshoworld.com").rstrip("/")
 HEADERS = {"Content-Type": "application/json", "User-Agent": "Mozilla/5.0"}
 PER_PAGE = 10
 OUT_FILE = "structure_hindi.json"
+COMPACT_FILE = "structure_hindi.bin"
+
+# replaced in main() once --concurrency / --rps are known
+CRAWL = CrawlPool()
 
 
 def log(msg):
     print(msg, flush=True)
 
 
-def post(path, payload, retries=3, delay=2):
+def post(path, payload, retries=3):
     url = BASE + path
-    for attempt in range(1, retries + 1):
-        try:
-            r = requests.post(
-                url,
-                headers=HEADERS,
-                json=payload,
-                timeout=30,
-            )
-            r.raise_for_status()
+
+    def attempt():
+        CRAWL.throttle.wait()
+        r = get_pool().post(url, headers=HEADERS, json=payload)
+        r.raise_for_status()
+        with profiling.stage("json"):
             return r.json()
-        except requests.exceptions.RequestException as e:
-            if attempt == retries:
-                raise
-            print(f"    [!] Network error, retrying ({attempt}/{retries})...")
-            time.sleep(delay * attempt)
+
+    return with_retries(attempt, retries, what=path)
 
 
 def get_build_id():
     log("[*] Resolving Next.js BUILD_ID …")
-    html = requests.get(BASE, timeout=30).text
+    html = get_pool().get(BASE).text
     build_id = html.split('"buildId":"')[1].split('"', 1)[0]
     log(f"[✓] BUILD_ID = {build_id}")
     return build_id
 
 
-def get_page(build_id, slug):
-    r = requests.get(f"{BASE}/_next/data/{build_id}/{slug}.json", timeout=30)
-    r.raise_for_status()
-    return r.json()
+def get_page(build_id, slug, retries=3):
+    def attempt():
+        CRAWL.throttle.wait()
+        r = get_pool().get(f"{BASE}/_next/data/{build_id}/{slug}.json")
+        r.raise_for_status()
+        with profiling.stage("json"):
+            return r.json()
+
+    return with_retries(attempt, retries, what=slug)
 
 
 def fetch_all_series():
-    all_items, page = [], 1
     log("[*] Fetching Hindi series list …")
-    while True:
+    payload = {"page": 1, "sortBy": "name", "language": "hindi"}
+    log("[>] POST search-series-home page=1")
+    first = post("/api/server/audio/search-series-home", payload)
+    all_items = list(first["items"])
+    total = first["total"][0]["total"]
+    pages = math.ceil(total / len(all_items)) if all_items else 1
+
+    def fetch_page(page):
         log(f"[>] POST search-series-home page={page}")
-        data = post(
-            "/api/server/audio/search-series-home",
-            {"page": page, "sortBy": "name", "language": "hindi"},
-        )
-        items = data["items"]
+        data = post("/api/server/audio/search-series-home", {**payload, "page": page})
+        log(f"[+] Page {page}: {len(data['items'])} items")
+        return data["items"]
+
+    for items in CRAWL.map("pages", fetch_page, range(2, pages + 1)):
         all_items += items
-        log(f"[+] Page {page}: {len(items)} items")
-        if len(all_items) >= data["total"][0]["total"]:
-            log(f"[✓] Total series fetched: {len(all_items)}")
-            break
-        page += 1
+    log(f"[✓] Total series fetched: {len(all_items)}")
     return all_items
 
 
@@ -67,69 +81,195 @@ def fetch_episodes(series_id, first_page):
     total = first_page["total"]
     pages = math.ceil(total / PER_PAGE)
     log(f"    [*] Episodes: {total} total, {pages} pages")
-    for p in range(2, pages + 1):
-        log(f"    [>] Fetching episodes page {p}/{pages}")
+
+    # total is known from the first page, so fan the rest out at once
+    def fetch_page(p):
         data = post(
             "/api/server/audio/series-filter",
             {"perPage": PER_PAGE, "page": p, "currentId": series_id, "search": ""},
         )
-        eps += data["listData"]
+        return data["listData"]
+
+    for items in CRAWL.map("pages", fetch_page, range(2, pages + 1)):
+        eps += items
     log(f"    [✓] Episodes fetched: {len(eps)}")
     return eps
 
 
 def fetch_subseries(series_id):
-    subs, page = [], 1
     log("    [*] Fetching sub-series …")
-    while True:
+    payload = {
+        "currentId": series_id,
+        "perPage": 16,
+        "sortBy": "index-dsc",
+        "page": 1,
+    }
+    first = post("/api/server/audio/subseries-filter", payload)
+    subs = list(first["listData"])
+    total = first["total"][0]["total"]
+    pages = math.ceil(total / len(subs)) if subs else 1
+
+    def fetch_page(page):
         log(f"    [>] subseries-filter page={page}")
-        data = post(
-            "/api/server/audio/subseries-filter",
-            {
-                "currentId": series_id,
-                "perPage": 16,
-                "sortBy": "index-dsc",
-                "page": page,
-            },
-        )
-        subs += data["listData"]
-        if len(subs) >= data["total"][0]["total"]:
-            log(f"    [✓] Sub-series fetched: {len(subs)}")
-            break
-        page += 1
+        data = post("/api/server/audio/subseries-filter", {**payload, "page": page})
+        return data["listData"]
+
+    for items in CRAWL.map("pages", fetch_page, range(2, pages + 1)):
+        subs += items
+    log(f"    [✓] Sub-series fetched: {len(subs)}")
     return subs
 
 
+def crawl_subseries(build_id, ss):
+    sp = get_page(build_id, ss["slug"])
+    spd = sp["pageProps"]["data"]["pageData"]
+    eps = fetch_episodes(spd["categoryData"]["_id"], spd)
+    return {"title": ss["title"], "slug": ss["slug"], "episodes": eps}
+
+
+def is_unchanged(old, count):
+    return old is not None and "episodes" in old and count == len(old["episodes"])
+
+
+def crawl_series(build_id, idx, s, old, journal):
+    """
+    Crawl one series or container. With the cached entry from a previous
+    run (--update), unchanged series and sub-series are reused. Finished
+    series and sub-series are recorded in journal, and anything already in
+    it (from an interrupted run) is not fetched again.
+    """
+    if "countSeries" not in s and is_unchanged(old, s.get("count")):
+        return {**old, "title": s["title"]}
+    if s["slug"] in journal:
+        return journal.get(s["slug"])
+
+    log(f"\n=== [{idx}] SERIES: {s['title']} ===")
+    page = get_page(build_id, s["slug"])
+    pd = page["pageProps"]["data"]["pageData"]
+    entry = {"title": s["title"], "slug": s["slug"]}
+
+    if "countSeries" in s:
+        entry["type"] = "container"
+        subs = fetch_subseries(pd["categoryData"]["_id"])
+        cached = {ss["slug"]: ss for ss in (old or {}).get("subseries", [])}
+
+        def crawl(ss):
+            prev = cached.get(ss["slug"])
+            if is_unchanged(prev, ss.get("count")):
+                return {**prev, "title": ss["title"]}
+            key = f"{s['slug']}/{ss['slug']}"
+            if key not in journal:
+                journal.record(key, crawl_subseries(build_id, ss))
+            return journal.get(key)
+
+        # sub-series of one container are crawled side by side
+        entry["subseries"] = CRAWL.map("subseries", crawl, subs)
+    else:
+        entry["type"] = "series"
+        entry["episodes"] = fetch_episodes(pd["categoryData"]["_id"], pd)
+
+    journal.record(s["slug"], entry)
+    return entry
+
+
+def entry_changes(old, entry):
+    """
+    (subseries title or None, added episodes, is new) for every series or
+    sub-series of entry, compared with its cached version old.
+    """
+    if "subseries" in entry:
+        cached = {ss["slug"]: ss for ss in (old or {}).get("subseries", [])}
+        return [
+            (
+                sub["title"],
+                added_episodes(cached.get(sub["slug"], {}).get("episodes"), sub["episodes"]),
+                sub["slug"] not in cached,
+            )
+            for sub in entry["subseries"]
+        ]
+    return [
+        (None, added_episodes((old or {}).get("episodes"), entry["episodes"]), old is None)
+    ]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Build structure_hindi.json")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=CONCURRENCY,
+        help=f"parallel requests per crawl stage (default {CONCURRENCY})",
+    )
+    parser.add_argument(
+        "--rps",
+        type=float,
+        default=RPS,
+        help=f"max requests per second overall, 0 = unlimited (default {RPS:g})",
+    )
+    parser.add_argument(
+        "--update",
+        action="store_true",
+        help="refresh the existing cache, re-crawling only new or changed series",
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="ignore the journal of an interrupted run and crawl from scratch",
+    )
+    metrics.add_arguments(parser)
+    profiling.add_arguments(parser)
+    return parser.parse_args()
+
+
 def main():
-    build_id = get_build_id()
-    structure = []
-
-    for idx, s in enumerate(fetch_all_series(), 1):
-        log(f"\n=== [{idx}] SERIES: {s['title']} ===")
-        page = get_page(build_id, s["slug"])
-        pd = page["pageProps"]["data"]["pageData"]
-        entry = {"title": s["title"], "slug": s["slug"]}
-
-        if "countSeries" in s:
-            entry["type"] = "container"
-            entry["subseries"] = []
-            for ss in fetch_subseries(pd["categoryData"]["_id"]):
-                sp = get_page(build_id, ss["slug"])
-                spd = sp["pageProps"]["data"]["pageData"]
-                eps = fetch_episodes(spd["categoryData"]["_id"], spd)
-                entry["subseries"].append(
-                    {"title": ss["title"], "slug": ss["slug"], "episodes": eps}
-                )
+    global CRAWL
+    args = parse_args()
+    metrics.start(args, "structure_cache_hindi")
+    profiling.start(args, "structure_cache_hindi")
+    CRAWL = CrawlPool(concurrency=args.concurrency, rps=args.rps)
+    # series, sub-series and page stages each hold up to `concurrency`
+    configure_http(pool_size=3 * args.concurrency)
+
+    previous = changelog = None
+    if args.update:
+        previous = load_cache(OUT_FILE)
+        if previous is None:
+            log(f"[!] No existing {OUT_FILE}, doing a full build")
         else:
-            entry["type"] = "series"
-            entry["episodes"] = fetch_episodes(pd["categoryData"]["_id"], pd)
+            changelog = Changelog(OUT_FILE, "hindi")
+    cached = {e["slug"]: e for e in previous or []}
+
+    journal = Journal(OUT_FILE, enabled=not args.restart)
+    if len(journal):
+        log(f"[*] Resuming interrupted build: {len(journal)} entries in {journal.path}")
 
-        structure.append(entry)
+    try:
+        build_id = get_build_id()
+        series = fetch_all_series()
+        # merged back in series-list order whatever order they finish in
+        structure = CRAWL.map(
+            "series",
+            lambda item: crawl_series(
+                build_id, *item, cached.get(item[1]["slug"]), journal
+            ),
+            enumerate(series, 1),
+        )
+    finally:
+        CRAWL.close()
 
-    with open(OUT_FILE, "w", encoding="utf-8") as f:
-        json.dump(structure, f, ensure_ascii=False, indent=2)
+    write_json_atomic(OUT_FILE, structure)
+    write_compact(COMPACT_FILE, structure, OUT_FILE)
+    journal.discard()
 
+    if changelog is not None:
+        for entry in structure:
+            for subseries, added, new in entry_changes(cached.get(entry["slug"]), entry):
+                changelog.add(entry["title"], added, subseries=subseries, new_series=new)
+    if changelog is not None:
+        changelog.write()
+        log(f"[✓] New episodes: {changelog.episode_count()} (see {changelog.path})")
     print(f"[✓] Structure cached → {OUT_FILE}")
+    print(f"[i] HTTP: {get_pool().stats.summary()}")
 
 
 if __name__ == "__main__":
@@ -1,9 +1,14 @@
 #!/usr/bin/env python3
 
-import requests
+import os
+import sys
 import time
+from pathlib import Path
 
-BASE = "https://oshoworld.com"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from oshodl.http_pool import get_pool
+
+BASE = os.environ.get("OSHOWORLD_BASE", "https://oshoworld.com").rstrip("/")
 API_FILTER = BASE + "/api/server/audio/filter"
 API_SEARCH = BASE + "/api/server/audio/search-series-home"
 
@@ -16,7 +21,7 @@ DELAY = 0.3  # polite delay between requests
 
 
 def post(url, payload):
-    r = requests.post(url, json=payload, headers=HEADERS, timeout=30)
+    r = get_pool().post(url, json=payload, headers=HEADERS)
     r.raise_for_status()
     return r.json()
 
@@ -99,6 +104,8 @@ def main():
         count = s.get("count", "?")
         print(f"[{i:03}] {title} ({count})")
 
+    print(f"\n[i] HTTP: {get_pool().stats.summary()}")
+
 
 if __name__ == "__main__":
     try:
@@ -1,8 +1,13 @@
-import requests
 import json
 import math
+import os
+import sys
+from pathlib import Path
 
-BASE = "https://oshoworld.com"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from oshodl.http_pool import get_pool
+
+BASE = os.environ.get("OSHOWORLD_BASE", "https://oshoworld.com").rstrip("/")
 
 HEADERS = {"Content-Type": "application/json", "User-Agent": "Mozilla/5.0"}
 
@@ -16,13 +21,13 @@ PER_PAGE = 10
 
 def post_json(path, payload):
     url = BASE + path
-    r = requests.post(url, headers=HEADERS, json=payload, timeout=30)
+    r = get_pool().post(url, headers=HEADERS, json=payload)
     r.raise_for_status()
     return r.json()
 
 
 def get_build_id():
-    html = requests.get(BASE, timeout=30).text
+    html = get_pool().get(BASE).text
     marker = '"buildId":"'
     i = html.find(marker)
     if i == -1:
@@ -32,7 +37,7 @@ def get_build_id():
 
 def get_series_page(build_id, slug):
     url = f"{BASE}/_next/data/{build_id}/{slug}.json"
-    r = requests.get(url, timeout=30)
+    r = get_pool().get(url)
     r.raise_for_status()
     return r.json()
 
@@ -189,6 +194,8 @@ def main():
     for s in series_list:
         inspect_series(build_id, s)
 
+    print(f"\n[i] HTTP: {get_pool().stats.summary()}")
+
 
 if __name__ == "__main__":
     main()